@@ -0,0 +1,102 @@
+"""
+Alignment of the shown minute with the minute boundary of the RTC.
+
+Each wake measures its latency from the wake until the frame of the time is
+ready and keeps a running estimate per path in the WakeRecord. The sleep
+ends that estimate plus MARGIN_MS before the next minute, so the wake finds
+the frame of the upcoming minute ready early, waits for the boundary and
+shows it within the window. Waits longer than a few ms for the boundary
+light sleep where the caller allows it. The error of the shown minute to the boundary is
+recorded for /metrics.
+"""
+import time
+
+from wakeprofile import FULL, FAST, RESIDENT  # paths of a wake
+
+MARGIN_MS = 100  # wake this much before the estimated latency, for its jitter
+WINDOW_MS = 5000  # a wake closer to the next minute than this shows that minute
+_DEFAULT_LATENCY_MS = (2000, 500, 20)
+_EMA_SHIFT = 2  # the estimate takes 1/4 of each new sample
+_BUSY_WAIT_MS = 50  # the end of a wait for the boundary, for the wake latency of light sleep
+
+_woke = 0  # ticks_ms of the wake, the reset for deep sleep
+
+
+def woke():
+    """Marks the wake from a light sleep, deep sleep wakes start at the reset."""
+    global _woke
+    _woke = time.ticks_ms()
+
+
+def _latency(wake, path):
+    latency = (wake.latency_full, wake.latency_fast, wake.latency_resident)[path]
+    return latency if latency else _DEFAULT_LATENCY_MS[path]
+
+
+def seconds_to_sleep(mytime, wake, path, step=1, next_job=0xFFFFFFFF):
+    """Returns the seconds to sleep, so that a wake on path is ready just before the next
+    minute, or the next multiple of step minutes. A wake at next_job takes the full path."""
+    to_next_minute = mytime.seconds_to_next_minute
+    if step > 1:
+        to_next_minute += 60 * (step - 1 - mytime.time[1] % step)
+    if path == FAST and due(time.time() + to_next_minute, next_job):
+        path = FULL  # the next wake runs jobs and takes the full path
+    return max(0.01, to_next_minute - (_latency(wake, path) + MARGIN_MS) / 1000)
+
+
+def due(now, deadline):
+    """Returns whether deadline (utime.time()) is due at now, a wake for the upcoming minute
+    counting as at the minute, e.g. for the jobs at multiples of 5 minutes."""
+    return now + WINDOW_MS // 1000 >= deadline
+
+
+def upcoming_time(mytime):
+    """Returns (h, m, ahead) of the minute to show, ahead if it is the next one, due within WINDOW_MS."""
+    if mytime.seconds_to_next_minute * 1000 <= WINDOW_MS:
+        h, m = mytime.time_in(60)
+        return h, m, True
+    h, m = mytime.time
+    return h, m, False
+
+
+def shown_minute(m, step=1, dots=False):
+    """Returns the minute of the phrase shown at minute m, a multiple of step, and the number
+    of minute dots past it."""
+    return m - m % step, m % step if dots else 0
+
+
+def frame_ready(wake, path):
+    """Takes the latency from the wake until now into the estimate of path."""
+    sample = min(time.ticks_diff(time.ticks_ms(), _woke), 0xFFFF)
+    latency = _latency(wake, path)
+    latency += (sample - latency) >> _EMA_SHIFT
+    if path == FULL:
+        wake.latency_full = latency
+    elif path == FAST:
+        wake.latency_fast = latency
+    else:
+        wake.latency_resident = latency
+
+
+def wait_for_boundary(mytime, light_sleep=True):
+    """Waits until the minute of upcoming_time() if it was ahead, unless it began meanwhile.
+    Light sleeps up to _BUSY_WAIT_MS before the boundary, unless light_sleep is False, e.g.
+    while the WiFi is connected."""
+    to_next_ms = int(mytime.seconds_to_next_minute * 1000)
+    if to_next_ms > WINDOW_MS:
+        return
+    if light_sleep and to_next_ms > 2*_BUSY_WAIT_MS:
+        import machine
+        machine.lightsleep(to_next_ms - _BUSY_WAIT_MS)
+        to_next_ms = int(mytime.seconds_to_next_minute * 1000)
+        if to_next_ms > _BUSY_WAIT_MS:
+            return  # the minute began during the sleep
+    time.sleep_ms(to_next_ms)
+
+
+def shown(mytime, wake):
+    """Records the error of the minute just shown to its boundary, late is positive."""
+    to_next_ms = int(mytime.seconds_to_next_minute * 1000)
+    error = 60000 - to_next_ms if to_next_ms > 30000 else -to_next_ms
+    wake.boundary_error = max(-0x8000, min(error, 0x7FFF))
+    wake.boundary_error_avg += (min(abs(error), 0xFFFF) - wake.boundary_error_avg) >> _EMA_SHIFT
@@ -0,0 +1,146 @@
+"""
+Transitions between two screens of the Max7219Chain.
+
+Wipes and sparkle reveals are stored as files of frame sized masks. Step
+n of a transition shows the new frame where mask n is set and the old frame
+elsewhere. Build the mask files on the host with
+
+    python animation.py
+
+Fades step the intensity register down, swap the frame and step it up again.
+Playback is driven by a hardware timer. All buffers are allocated when the
+Animator is created, so the timer callback never allocates.
+"""
+try:
+    from micropython import const
+except ImportError:
+    const = lambda v: v
+
+from frame import Frame
+
+NONE = const(0)
+FADE = const(1)
+WIPE = const(2)
+SPARKLE = const(3)
+
+NAMES = {"none": NONE, "fade": FADE, "wipe": WIPE, "sparkle": SPARKLE}
+MASK_FILES = {WIPE: "anim_wipe.bin", SPARKLE: "anim_sparkle.bin"}
+SPARKLE_STEPS = 12
+
+
+class Animator:
+    def __init__(self, matrix, timer_id=0, period_ms=30):
+        self._matrix = matrix
+        self._timer_id = timer_id
+        self._period_ms = period_ms
+        self._timer = None
+        geometry = matrix.frame.geometry
+        self._size = geometry.frame_size
+        self._old = Frame(geometry=geometry)
+        self._new = Frame(geometry=geometry)
+        self._mask = Frame(geometry=geometry)
+        self._out = Frame(geometry=geometry)
+        self._file = None
+        self._kind = NONE
+        self._step = 0
+        self._brightness = 15
+        self._tick_ref = self._tick  # bound once, creating it in the callback would allocate
+        self.running = False
+
+    def start(self, kind, frame):
+        """Starts the transition from the shown frame to frame, returns at once."""
+        self.stop()
+        self._old.buffer[:] = self._matrix.frame.buffer
+        self._new.buffer[:] = frame.buffer
+        self._brightness = self._matrix.brightness
+        self._step = 0
+        if kind in MASK_FILES:
+            try:
+                self._file = open(MASK_FILES[kind], "rb")
+            except OSError:
+                print("No mask file for animation", kind)
+                kind = NONE
+        if kind == NONE:
+            self._matrix.show_frame(self._new)
+            return
+        self._kind = kind
+        self.running = True
+        if self._timer is None:
+            from machine import Timer
+            self._timer = Timer(self._timer_id)
+        self._timer.init(mode=self._timer.PERIODIC, period=self._period_ms, callback=self._tick_ref)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.deinit()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.running:
+            self.running = False
+            self._matrix.set_brightness(self._brightness)
+            self._matrix.show_frame(self._new)
+
+    def wait(self):
+        """Blocks until the running transition has finished."""
+        import time
+        while self.running:
+            time.sleep_ms(self._period_ms)
+
+    def _tick(self, timer):
+        if self._kind == FADE:
+            self._fade_step()
+        elif self._file.readinto(self._mask.buffer) == self._size:
+            old = self._old.buffer
+            new = self._new.buffer
+            mask = self._mask.buffer
+            out = self._out.buffer
+            for i in range(self._size):
+                out[i] = (old[i] & ~mask[i]) | (new[i] & mask[i])
+            self._matrix.show_frame(self._out)
+        else:
+            self.stop()
+
+    def _fade_step(self):
+        # brightness .. 0 with the old frame, then 0 .. brightness with the new one
+        level = self._brightness - self._step
+        if level == 0:
+            self._matrix.show_frame(self._new)
+        elif level < 0:
+            level = -level
+        self._step += 1
+        if level > self._brightness:
+            self.stop()
+        else:
+            self._matrix.write_intensity(level)
+
+
+def build():
+    """Writes the mask files of the wipe and the sparkle reveal."""
+    mask = Frame()
+    rows, cols = mask.geometry.rows, mask.geometry.cols
+    with open(MASK_FILES[WIPE], "wb") as f:
+        for c in range(cols):
+            for r in range(rows):
+                mask.set_pixel(r, c)
+            f.write(mask.buffer)
+
+    # fixed pseudo random order of all pixels, so the build is reproducible
+    pixels = list(range(rows * cols))
+    seed = 1
+    for i in range(len(pixels) - 1, 0, -1):
+        seed = (seed * 1103515245 + 12345) % 2**31
+        j = seed % (i + 1)
+        pixels[i], pixels[j] = pixels[j], pixels[i]
+    mask.clear()
+    per_step = (len(pixels) + SPARKLE_STEPS - 1) // SPARKLE_STEPS
+    with open(MASK_FILES[SPARKLE], "wb") as f:
+        for step in range(SPARKLE_STEPS):
+            for p in pixels[step * per_step:(step + 1) * per_step]:
+                mask.set_pixel(p // cols, p % cols)
+            f.write(mask.buffer)
+    print("Wrote", ", ".join(MASK_FILES.values()))
+
+
+if __name__ == "__main__":
+    build()
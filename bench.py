@@ -0,0 +1,211 @@
+"""
+Benchmarks of the rendering and display paths.
+
+Runs on the host, with CPython or the unix port of MicroPython:
+
+    python bench.py [-n iterations] [-o results.json] [-c baseline.json]
+
+Every benchmark reports per call latency percentiles in microseconds, the
+bytes allocated per call (tracemalloc on CPython, gc.mem_alloc on MicroPython)
+and the SPI bytes and transactions per call, sent to a simulated chain. The results are written as JSON,
+and compared against a baseline file of an earlier commit if one is given.
+"""
+import gc
+import json
+import os
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+if hasattr(time, "ticks_us"):
+    _ticks_us = time.ticks_us
+    _ticks_diff = time.ticks_diff
+else:
+    _ticks_us = lambda: time.perf_counter_ns() // 1000
+    _ticks_diff = lambda a, b: a - b
+
+ALLOC_ITERATIONS = 50  # MicroPython runs them with the GC disabled
+REGRESSION = 1.1  # report slowdowns of more than 10 %
+BENCH_CFG = "bench_cfg"
+
+
+class _Quiet:
+    """Swallows the debug prints of the benchmarked code where sys.stdout can be replaced."""
+    def write(self, s):
+        return len(s)
+
+    def __enter__(self):
+        self._stdout = sys.stdout
+        try:
+            sys.stdout = self
+        except AttributeError:
+            pass
+        return self
+
+    def __exit__(self, *args):
+        try:
+            sys.stdout = self._stdout
+        except AttributeError:
+            pass
+
+
+def _percentile(sorted_values, p):
+    return sorted_values[int(p / 100 * (len(sorted_values) - 1))]
+
+
+def _allocated_bytes(func, iterations):
+    if tracemalloc is not None:
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        for i in range(iterations):
+            func(i)
+        end = tracemalloc.get_traced_memory()[0]
+        # memory freed again is not in the difference, so add what reached the peak
+        end = max(end, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        return (end - start) / iterations
+    if hasattr(gc, "mem_alloc"):
+        gc.collect()
+        gc.disable()
+        start = gc.mem_alloc()
+        for i in range(iterations):
+            func(i)
+        end = gc.mem_alloc()
+        gc.enable()
+        return (end - start) / iterations
+    return None
+
+
+def measure(name, func, iterations, spi=None):
+    # spi is the max7219sim.SimChain counting the traffic of func
+    latencies = [0] * iterations
+    with _Quiet():
+        func(0)  # warm up caches and lazy initialisation
+        gc.collect()
+        spi_bytes = spi.bytes if spi else 0
+        spi_writes = spi.transactions if spi else 0
+        for i in range(iterations):
+            start = _ticks_us()
+            func(i)
+            latencies[i] = _ticks_diff(_ticks_us(), start)
+        if spi:
+            spi_bytes = (spi.bytes - spi_bytes) / iterations
+            spi_writes = (spi.transactions - spi_writes) / iterations
+        alloc = _allocated_bytes(func, min(iterations, ALLOC_ITERATIONS))
+    latencies.sort()
+    result = {"name": name,
+              "calls": iterations,
+              "p50_us": _percentile(latencies, 50),
+              "p90_us": _percentile(latencies, 90),
+              "p99_us": _percentile(latencies, 99),
+              "max_us": latencies[-1],
+              "mean_us": sum(latencies) / iterations,
+              "alloc_bytes": alloc}
+    if spi:
+        result["spi_bytes"] = spi_bytes
+        result["spi_writes"] = spi_writes
+    print("{:40s} p50 {:8d} us  p99 {:8d} us  alloc {}".format(name, result["p50_us"], result["p99_us"], alloc))
+    return result
+
+
+def benchmarks():
+    """Returns (name, function of the iteration number, spi) of all benchmarks."""
+    import common
+    from frame import Frame
+    from frametable import FrameTable
+    from max7219sim import simulated_matrix
+    from textmatrix import CharacterMatrix, TextFinder
+
+    finder = TextFinder()
+    table = FrameTable()
+    time_texts = [finder.get_time_texts(i // 60, i % 60) for i in range(12 * 60)]
+    with open(BENCH_CFG, "w") as f:
+        f.write(str(common.load_config("no_cfg")))
+
+    with _Quiet():
+        matrix, spi = simulated_matrix()
+        time_frame = Frame()
+        time_frame.buffer[:] = finder.get_time_frame(10, 42).buffer
+        next_frame = Frame()
+        next_frame.buffer[:] = finder.get_time_frame(10, 43).buffer
+        frames = (time_frame, next_frame)
+    time_positions = time_frame.positions()
+    full_positions = Frame().fill().positions()
+
+    return [
+        ("TextFinder.get_time_frame", lambda i: finder.get_time_frame(i // 60 % 24, i % 60), None),
+        ("TextFinder.get_time_positions", lambda i: finder.get_time_positions(i // 60 % 24, i % 60), None),
+        ("TextFinder.get_temperature_frame", lambda i: finder.get_temperature_frame((i % 800 - 399) / 10), None),
+        ("TextFinder.get_temperature_positions", lambda i: finder.get_temperature_positions((i % 800 - 399) / 10), None),
+        ("TextFinder.get_humidity_frame", lambda i: finder.get_humidity_frame(i % 100), None),
+        ("TextFinder.get_humidity_positions", lambda i: finder.get_humidity_positions(i % 100), None),
+        ("TextFinder.get_date_frame", lambda i: finder.get_date_frame(i % 31 + 1, i % 12 + 1), None),
+        ("TextFinder.get_date_positions", lambda i: finder.get_date_positions(i % 31 + 1, i % 12 + 1), None),
+        ("TextFinder.get_luminance_frame", lambda i: finder.get_luminance_frame(i % 1000), None),
+        ("TextFinder.get_luminance_position", lambda i: finder.get_luminance_position(i % 1000), None),
+        ("TextFinder.get_weather_frame", lambda i: finder.get_weather_frame(i % 4), None),
+        ("TextFinder.get_weather_positions", lambda i: finder.get_weather_positions(i % 4), None),
+        ("CharacterMatrix.findTexts", lambda i: CharacterMatrix.findTexts(time_texts[i % 720]), None),
+        ("CharacterMatrix.searchTexts", lambda i: CharacterMatrix.searchTexts(time_texts[i % 720]), None),
+        ("FrameTable.get_time_frame", lambda i: table.get_time_frame(i // 60 % 12, i % 60), None),
+        ("Max7219Chain.show (all digits)", lambda i: (matrix.invalidate(), matrix.show()), spi),
+        ("Max7219Chain.show_frame (minute change)", lambda i: matrix.show_frame(frames[i % 2]), spi),
+        ("Max7219Chain.show_frame (unchanged)", lambda i: matrix.show_frame(time_frame), spi),
+        ("Max7219Chain.show_pixels (time)", lambda i: matrix.show_pixels(time_positions if i % 2 else full_positions), spi),
+        ("Max7219Chain.show_pixels (all on)", lambda i: matrix.show_pixels(full_positions if i % 2 else time_positions), spi),
+        ("common.load_config", lambda i: common.load_config(BENCH_CFG), None),
+    ]
+
+
+def compare(results, baseline):
+    base = {r["name"]: r for r in baseline["results"]}
+    print("\nComparison to", baseline["commit"])
+    for r in results["results"]:
+        b = base.get(r["name"])
+        if b is None:
+            continue
+        for key in ("p50_us", "alloc_bytes", "spi_bytes"):
+            new, old = r.get(key), b.get(key)
+            if new is None or old is None:
+                continue
+            flag = " !" if new > old * REGRESSION and new > old + 1 else ""
+            print("{:40s} {:12s} {:10.1f} -> {:10.1f}{}".format(r["name"], key, old, new, flag))
+
+
+def main(args):
+    iterations = 200
+    output = "bench.json"
+    baseline = None
+    commit = ""
+    while args:
+        opt = args.pop(0)
+        if opt == "-n":
+            iterations = int(args.pop(0))
+        elif opt == "-o":
+            output = args.pop(0)
+        elif opt == "-c":
+            baseline = args.pop(0)
+        elif opt == "-m":
+            commit = args.pop(0)  # label of the results, e.g. the commit hash
+        else:
+            print(__doc__)
+            return
+    results = {"commit": commit,
+               "implementation": sys.implementation.name,
+               "iterations": iterations,
+               "results": [measure(name, func, iterations, spi) for name, func, spi in benchmarks()]}
+    os.remove(BENCH_CFG)
+    with open(output, "w") as f:
+        json.dump(results, f)
+    print("Wrote results to", output)
+    if baseline:
+        with open(baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
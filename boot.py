@@ -7,6 +7,7 @@
 # webrepl.start()
 import gc
 gc.collect()
+import wakeprofile
 
 import os
 if "next" in os.listdir("."):
@@ -15,3 +16,4 @@ if "next" in os.listdir("."):
         otaUpdater = OTAUpdater('https://github.com/chrismue/tegschtuhr', main_dir="/")
         otaUpdater.install_new_version_if_downloaded()
 print("No Folder 'next' found for update")
+wakeprofile.end(wakeprofile.BOOT)
@@ -63,13 +63,33 @@ class DNSServer(Server):
         # check the DNS question, and respond with an answer
         try:
             data, sender = sock.recvfrom(1024)
-            request = DNSQuery(data)
-
-            print("Sending {:s} -> {:s}".format(request.domain, self.ip_addr))
-            sock.sendto(request.answer(self.ip_addr), sender)
-
-            # help MicroPython with memory management
-            del request
-            gc.collect()
+            self.answer(data, sender)
         except Exception as e:
             print("DNS server exception:", e)
+
+    async def run(self, on_request):
+        """Answers the questions as a uasyncio task, sleeping until the socket is readable."""
+        from uasyncio import core
+        self.sock.setblocking(False)
+        while True:
+            # the wait of asyncio.StreamReader, whose reads would drop the sender
+            yield core._io_queue.queue_read(self.sock)
+            try:
+                data, sender = self.sock.recvfrom(1024)
+            except OSError:
+                continue
+            try:
+                self.answer(data, sender)
+                on_request()
+            except Exception as e:
+                print("DNS server exception:", e)
+
+    def answer(self, data, sender):
+        request = DNSQuery(data)
+
+        print("Sending {:s} -> {:s}".format(request.domain, self.ip_addr))
+        self.sock.sendto(request.answer(self.ip_addr), sender)
+
+        # help MicroPython with memory management
+        del request
+        gc.collect()
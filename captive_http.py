@@ -6,6 +6,7 @@ import ujson
 
 from collections import namedtuple
 from credentials import Creds
+from textmatrix import CharacterMatrix
 
 import common
 
@@ -24,7 +25,13 @@ _charref = re.compile(r'%([0-9a-fA-F][0-9a-fA-F])')
 
 class HTTPServer(Server):
     def __init__(self, poller, local_ip, mac_address, callback_for_measurements, callback_for_networks, callback_for_lightlevel, callback_for_update):
-        super().__init__(poller, 80, socket.SOCK_STREAM, "HTTP Server")
+        if poller is not None:
+            super().__init__(poller, 80, socket.SOCK_STREAM, "HTTP Server")
+        else:
+            # served by a uasyncio stream server, see serve()
+            self.name = "HTTP Server"
+            self.poller = None
+            self.sock = None
         if type(local_ip) is bytes:
             self.local_ip = local_ip
         else:
@@ -41,13 +48,15 @@ class HTTPServer(Server):
                        b"/login": self.login,
                        b"/settings": self.settings,
                        b"/update_software": self.update_software,
-                       b"/lightprev": self.prev_light}
+                       b"/lightprev": self.prev_light,
+                       b"/metrics": self.metrics}
 
         self.ssid = None
 
-        # queue up to 5 connection requests before refusing
-        self.sock.listen(5)
-        self.sock.setblocking(False)
+        if self.sock is not None:
+            # queue up to 5 connection requests before refusing
+            self.sock.listen(5)
+            self.sock.setblocking(False)
 
     def set_ip(self, new_ip, new_ssid):
         """update settings after connected to local WiFi"""
@@ -76,6 +85,43 @@ class HTTPServer(Server):
             return True
         return False
 
+    async def serve(self, reader, writer):
+        """answer one request on the streams of uasyncio.start_server"""
+
+        try:
+            req = b""
+            while req[-4:] != b"\r\n\r\n":
+                data = await reader.read(BYTES_IN_BUFFER)
+                if not data:
+                    return
+                req += data
+            req = self.parse_request(req)
+            if self.is_valid_req(req):
+                body, headers = self.get_response(req)
+            else:
+                headers = (
+                    b"HTTP/1.1 307 Temporary Redirect\r\n"
+                    b"Location: http://{:s}/\r\n".format(self.local_ip)
+                )
+                body = uio.BytesIO(b"")
+            writer.write(headers + b"\r\n")
+            await writer.drain()
+            buff = bytearray(BYTES_IN_BUFFER)
+            buffmv = memoryview(buff)
+            while True:
+                bytes_read = body.readinto(buff)
+                if not bytes_read:
+                    break
+                writer.write(buffmv[:bytes_read])
+                await writer.drain()
+            body.close()
+        except Exception as e:
+            print("HTTP server exception:", e)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+            gc.collect()
+
     def accept(self, server_sock):
         """accept a new client request socket and register it for polling"""
 
@@ -127,16 +173,42 @@ class HTTPServer(Server):
         headers = (
             b"HTTP/1.1 200 OK\r\n"
         )
-        info = common.get_config()
+        info = dict(common.get_config())
         info["act_temperature"], info["act_humidity"], info["act_pressure"], info["act_brightness"], current_version, latest_version = self.callback_for_measurements()
         info["mac_address"] = self.mac_address
         info["ssid"] = Creds().load().ssid
         info["av_networks"] = self.callback_for_networks()
         info["current_version"] = current_version
         info["latest_version"] = latest_version
+        info["matrix"] = CharacterMatrix.MATRIX
         info["update_available"] = (len(latest_version) > 0) and (latest_version > current_version)
+        info["energy"] = self.budget_status()
         return ujson.dumps(info), headers
 
+    def budget_status(self):
+        from rtcstate import RTCState, WakeRecord
+        import governor
+        return governor.status(WakeRecord(RTCState().load().wake).read())
+
+    def metrics(self, params):
+        """min, avg and p95 of the wake phases of the last deep sleeps in us, the minute alignment and the energy budget in ms"""
+        from rtcstate import RTCState, WakeRecord
+        import wakeprofile
+        headers = (
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/json\r\n"
+        )
+        state = RTCState().load()
+        result = wakeprofile.stats(state.profile)
+        wake = WakeRecord(state.wake).read()
+        result["alignment"] = {"error_ms": wake.boundary_error,
+                               "error_avg_ms": wake.boundary_error_avg,
+                               "latency_ms": {"full": wake.latency_full,
+                                              "fast": wake.latency_fast,
+                                              "resident": wake.latency_resident}}
+        result["budget"] = self.budget_status()
+        return ujson.dumps(result), headers
+
     def prev_light(self, params):
         prev_level = int(params.get(b"prev_level", 15))
         self.callback_for_lightlevel(prev_level)
@@ -170,11 +242,22 @@ class HTTPServer(Server):
                     custom_pos.append([x,y])
         timeout = int(params.get(b"timeout", None)) * 1000
         debug = params.get(b"debug", None)
+        animation = params.get(b"animation", b"none").decode()
+        stream = params.get(b"stream", None)
+        sleep = params.get(b"sleep", b"deep").decode()
+        budget = params.get(b"budget", 0)
+        dark_start = params.get(b"dark_start", b"00:00").decode()
+        dark_end = params.get(b"dark_end", b"00:00").decode()
+        dark_lux = params.get(b"dark_lux", 0.0)
+        granularity = params.get(b"granularity", 1)
+        minute_dots = params.get(b"minute_dots", None)
+        worker = params.get(b"worker", None)
 
         common.store_config(lat, lon, foreindex, ap_id,
                             min_level, min_lum, max_level, max_lum,
                             custom_pos,
-                            timeout, debug)
+                            timeout, debug, animation, stream, sleep, budget,
+                            dark_start, dark_end, dark_lux, granularity, minute_dots, worker)
 
         return self._redirect_response()
 
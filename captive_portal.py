@@ -6,6 +6,7 @@ import utime as time
 
 from captive_dns import DNSServer
 from captive_http import HTTPServer
+from captive_stream import StreamServer
 from credentials import Creds
 
 
@@ -34,9 +35,11 @@ class CaptivePortal:
 
         self.dns_server = None
         self.http_server = None
+        self.stream_server = None
         self.poller = select.poll()
 
         self.conn_time_start = None
+        self.requests = 0  # served by the uasyncio session, see serve()
 
     def start_access_point(self):
         # sometimes need to turn off AP before it will come up properly
@@ -53,6 +56,32 @@ class CaptivePortal:
         print("AP mode configured:", self.ap_if.ifconfig())
 
     def connect_to_wifi(self):
+        self._begin_connect()
+
+        attempts = 1
+        while attempts <= self.MAX_CONN_ATTEMPTS:
+            if not self._is_connected():
+                print("Connection attempt {:d}/{:d} ...".format(attempts, self.MAX_CONN_ATTEMPTS))
+                time.sleep(2)
+                attempts += 1
+            else:
+                return True
+
+        return self._connect_failed()
+
+    async def connect_to_wifi_async(self):
+        import uasyncio as asyncio
+        self._begin_connect()
+
+        for attempts in range(1, self.MAX_CONN_ATTEMPTS + 1):
+            if self._is_connected():
+                return True
+            print("Connection attempt {:d}/{:d} ...".format(attempts, self.MAX_CONN_ATTEMPTS))
+            await asyncio.sleep(2)
+
+        return self._connect_failed()
+
+    def _begin_connect(self):
         print(
             "Trying to connect to SSID '{:s}' with password {:s}".format(
                 self.creds.ssid, "*"*len(self.creds.password)
@@ -64,17 +93,14 @@ class CaptivePortal:
         self.sta_if.config(dhcp_hostname="tegschtuhr")
         self.sta_if.connect(self.creds.ssid, self.creds.password)
 
-        attempts = 1
-        while attempts <= self.MAX_CONN_ATTEMPTS:
-            if not self.sta_if.isconnected():
-                print("Connection attempt {:d}/{:d} ...".format(attempts, self.MAX_CONN_ATTEMPTS))
-                time.sleep(2)
-                attempts += 1
-            else:
-                self.local_ip = self.sta_if.ifconfig()[0]
-                print("Connected to {:s} with IP {:s}".format(self.creds.ssid, self.local_ip))
-                return True
+    def _is_connected(self):
+        if self.sta_if.isconnected():
+            self.local_ip = self.sta_if.ifconfig()[0]
+            print("Connected to {:s} with IP {:s}".format(self.creds.ssid, self.local_ip))
+            return True
+        return False
 
+    def _connect_failed(self):
         print(
             "Failed to connect to {:s} with {:s}. WLAN status={:d}".format(
                 self.creds.ssid, self.creds.password, self.sta_if.status()
@@ -159,6 +185,66 @@ class CaptivePortal:
 
         return ret
 
+    async def serve(self, matrix=None):
+        """Runs the portal as uasyncio tasks until cancelled.
+
+        HTTP is served by a stream server. Without WiFi credentials, or if they
+        fail, the access point and the DNS server run until the WiFi is
+        configured. With matrix, the frames of the stream server are shown.
+        self.requests counts the requests served and the frames shown."""
+        import uasyncio as asyncio
+        # sockets of the polled servers, e.g. from try_connect_from_file(), would keep the ports
+        if self.http_server is not None and self.http_server.sock is not None:
+            self.http_server.stop(self.poller)
+        self.http_server = HTTPServer(None, self.local_ip, self.mac_address, self.callback_for_measurements, self.list_networks, self.callback_for_lightlevel, self.callback_for_update)
+        http = await asyncio.start_server(self._serve_http, "0.0.0.0", 80)
+        tasks = []
+        try:
+            if matrix is not None:
+                self.stream_server = StreamServer(None, matrix, on_show=self._count_request)
+                tasks.append(asyncio.create_task(self.stream_server.run()))
+
+            self.sta_if.active(False)  # force a reconnect
+            if not (self.creds.load().is_valid() and await self.connect_to_wifi_async()):
+                print("Starting captive portal")
+                self.start_access_point()
+                self.dns_server = DNSServer(None, self.local_ip)
+                dns = asyncio.create_task(self.dns_server.run(self._count_request))
+                tasks.append(dns)
+                while not (self.creds.load().is_valid() and await self.connect_to_wifi_async()):
+                    await asyncio.sleep_ms(500)
+                print("Connected to WiFi!")
+                self.http_server.set_ip(self.local_ip, self.creds.ssid)
+                dns.cancel()
+                await asyncio.sleep_ms(self.AP_OFF_DELAY)
+                self.ap_if.active(False)
+                print("Turned off access point")
+            else:
+                self.http_server.set_ip(self.local_ip, self.creds.ssid)
+
+            while True:
+                await asyncio.sleep(60)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.dns_server is not None:
+                self.dns_server.stop(None)
+                self.dns_server = None
+            if self.stream_server is not None:
+                self.stream_server.stop(None)
+                self.stream_server = None
+            http.close()
+            await http.wait_closed()
+            self.http_server = None
+            gc.collect()
+
+    def _count_request(self):
+        self.requests += 1
+
+    async def _serve_http(self, reader, writer):
+        self._count_request()
+        await self.http_server.serve(reader, writer)
+
     def handle_socket_events(self):
         for response in self.poller.ipoll(100):
             sock, event, *others = response
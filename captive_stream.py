@@ -0,0 +1,61 @@
+import usocket as socket
+import utime as time
+
+from server import Server
+
+STREAM_PORT = 4048  # the port of DDP
+HEADER_SIZE = 2  # sequence number, intensity
+RESYNC_MS = 1000  # after a pause, take any sequence number (e.g. restarted sender)
+
+
+class StreamServer(Server):
+    """Shows frames streamed over UDP.
+
+    A packet is a sequence number (0..255, wrapping), an intensity (1..15, 0
+    keeps the brightness) and a frame in the register order of the
+    Max7219Chain. Packets older than the last shown one are dropped.
+    on_show is called for every frame shown, e.g. to keep a session alive."""
+
+    def __init__(self, poller, matrix, port=STREAM_PORT, on_show=None):
+        super().__init__(poller, port, socket.SOCK_DGRAM, "Stream Server")
+        self.sock.setblocking(False)
+        self.matrix = matrix
+        self.on_show = on_show
+        self.frame_size = len(matrix.frame.buffer)
+        self.packet = bytearray(HEADER_SIZE + self.frame_size)
+        self.packetmv = memoryview(self.packet)
+        self.last_seq = -1
+        self.last_ticks = 0
+        self.shown = 0
+        self.dropped = 0
+
+    async def run(self):
+        """Shows the packets as a uasyncio task."""
+        import uasyncio as asyncio
+        stream = asyncio.StreamReader(self.sock)
+        while True:
+            self.show(await stream.readinto(self.packet))
+
+    def show(self, size):
+        if size != len(self.packet):
+            self.dropped += 1
+            return
+        seq = self.packet[0]
+        now = time.ticks_ms()
+        if self.last_seq >= 0 and not 0 < (seq - self.last_seq) & 0xFF < 128 \
+                and time.ticks_diff(now, self.last_ticks) < RESYNC_MS:
+            self.dropped += 1
+            return
+        self.last_seq = seq
+        self.last_ticks = now
+        if self.packet[1]:
+            self.matrix.set_brightness(self.packet[1])
+        self.matrix.frame.buffer[:] = self.packetmv[HEADER_SIZE:]
+        self.matrix.flush()
+        self.shown += 1
+        if self.on_show is not None:
+            self.on_show()
+
+    def stop(self, poller):
+        print(self.name, "showed", self.shown, "frames, dropped", self.dropped)
+        super().stop(poller)
@@ -12,14 +12,12 @@ global _cfg
 
 import os
 
-try: 
-    _cfg
-except NameError:
+def load_config(filename="cfg"):
     try:
-        with open("cfg", "r") as f:
-            _cfg = eval(f.read())
+        with open(filename, "r") as f:
+            return eval(f.read())
     except OSError:
-        _cfg = {"lat": 46.98,
+        return {"lat": 46.98,
                 "lon": 8.31,
                 "foreindex": 4,
                 "ap_id": "<Your OpenWeather-API-Key>",
@@ -29,12 +27,29 @@ except NameError:
                 "max_lum": 10,
                 "custom_pos": [[0,0], [2, 8], [6,5], [7, 4], [8,0]],
                 "timeout": 120000,
-                "debug": False}
+                "debug": False,
+                "animation": "none",
+                "stream": False,
+                "sleep": "deep",
+                "budget": 0,
+                "dark_start": "00:00",
+                "dark_end": "00:00",
+                "dark_lux": 0.0,
+                "granularity": 1,
+                "minute_dots": False,
+                "worker": False}
+
+try: 
+    _cfg
+except NameError:
+    _cfg = load_config()
 
 def store_config(lat, lon, foreindex, ap_id,
                  min_level, min_lum, max_level, max_lum,
                  custom_pos, 
-                 timeout, debug):
+                 timeout, debug, animation="none", stream=False, sleep="deep", budget=0,
+                 dark_start="00:00", dark_end="00:00", dark_lux=0.0,
+                 granularity=1, minute_dots=False, worker=False):
     global _cfg
     _cfg = {"lat": float(lat), 
             "lon": float(lon), 
@@ -46,7 +61,17 @@ def store_config(lat, lon, foreindex, ap_id,
             "max_lum": int(max_lum),
             "custom_pos": custom_pos,
             "timeout": int(timeout),
-            "debug": bool(debug)}
+            "debug": bool(debug),
+            "animation": str(animation),
+            "stream": bool(stream),
+            "sleep": str(sleep),
+            "budget": int(budget),
+            "dark_start": str(dark_start),
+            "dark_end": str(dark_end),
+            "dark_lux": float(dark_lux),
+            "granularity": int(granularity),
+            "minute_dots": bool(minute_dots),
+            "worker": bool(worker)}
     
     with open("cfg", "w") as f:
         f.write(str(_cfg))
@@ -61,6 +86,27 @@ def get_luminance_cfg():
 def get_weather_cfg():
     return _cfg["lat"], _cfg["lon"], _cfg["foreindex"], _cfg["ap_id"]
 
+def get_animation_cfg():
+    return _cfg.get("animation", "none")
+
+def get_stream_cfg():
+    return _cfg.get("stream", False)
+
+def get_sleep_cfg():
+    return _cfg.get("sleep", "deep")
+
+def get_budget_cfg():
+    return _cfg.get("budget", 0)
+
+def get_dark_cfg():
+    return _cfg.get("dark_start", "00:00"), _cfg.get("dark_end", "00:00"), _cfg.get("dark_lux", 0.0)
+
+def get_granularity_cfg():
+    return _cfg.get("granularity", 1), _cfg.get("minute_dots", False)
+
+def get_worker_cfg():
+    return _cfg.get("worker", False)
+
 def get_custompos_cfg():
     return _cfg["custom_pos"]
 
@@ -0,0 +1,48 @@
+"""
+Dark hours: the display is shut down and the clock sleeps for long intervals.
+
+They are a daily schedule ("dark_start" to "dark_end", local "HH:MM", equal
+for none) and, optionally, the BH1750 reading less than "dark_lux" lux
+(0 for never), e.g. an unused room. The wakes in the dark hours only check
+whether they are over, a touch shows the time for a moment.
+"""
+import common
+
+MAX_SLEEP_S = 30*60  # the internal RTC drifts in deep sleep, see main.RTC_SYNC_INTERVAL_S
+LUX_SLEEP_S = 10*60  # until the next light read, when dark by the luminance only
+UNKNOWN_LUX = -1.0  # a luminance that was not measured, never dark
+SHOW_MS = 5000  # a touch shows the time this long
+
+
+def _minutes(hhmm):
+    return int(hhmm[:2])*60 + int(hhmm[3:5])
+
+
+def _scheduled(minute, start, end):
+    # whether minute of the day is in the schedule from start to end, maybe over midnight
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+
+def active(h, m, luminance):
+    """Returns whether h:m is in the dark hours, at luminance lux (UNKNOWN_LUX: not by the luminance)."""
+    start, end, lux = common.get_dark_cfg()
+    return _scheduled(h*60 + m, _minutes(start), _minutes(end)) or 0 <= luminance < lux
+
+
+def luminance(lightsensor):
+    """Returns the luminance to keep for active(): measured by lightsensor if "dark_lux" is set,
+    which get_light_level() does not always do, UNKNOWN_LUX otherwise."""
+    lux = lightsensor.measured_luminance() if common.get_dark_cfg()[2] else None
+    return UNKNOWN_LUX if lux is None else lux
+
+
+def seconds_to_sleep(mytime):
+    """Returns the seconds to sleep in the dark hours, until their end or the next light read."""
+    start, end, lux = common.get_dark_cfg()
+    h, m = mytime.time
+    if not _scheduled(h*60 + m, _minutes(start), _minutes(end)):
+        return LUX_SLEEP_S
+    to_end = ((_minutes(end) - h*60 - m - 1) % (24*60))*60 + mytime.seconds_to_next_minute
+    return max(1, min(to_end, MAX_SLEEP_S))
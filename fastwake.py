@@ -0,0 +1,151 @@
+"""
+Fast path of a timer wake from deep sleep: show the time and sleep again.
+
+main.py runs it first on every timer wake. It imports only the modules that
+showing the time needs, one at a time when they are needed, and returns
+without sleeping whenever the full path of main.py is needed: no valid
+state in RTC memory, the touch sensor pressed, a job due or the time not
+in the frame table. In the dark hours it only keeps the display shut down.
+The portal, the ambient sensor, NTP and OTA are never imported here.
+
+The ticks_us of every import and construction are printed before sleeping.
+Each module is imported after the ones it imports, so that every line of
+the report is the cost of its own module.
+"""
+import time
+
+_costs = []
+_ticks = time.ticks_us()
+
+
+def _mark(name):
+    # records the time since the previous mark as the cost of name
+    global _ticks
+    now = time.ticks_us()
+    _costs.append((name, time.ticks_diff(now, _ticks)))
+    _ticks = now
+
+
+def report():
+    total = 0
+    for name, us in _costs:
+        total += us
+        print("fastwake: {:<12} {:>7} us".format(name, us))
+    print("fastwake: {:<12} {:>7} us".format("total", total))
+
+
+def run():
+    """Shows the time and deep sleeps, returns False if main.py has to do it."""
+    import machine
+    import wakeprofile
+    _mark("wakeprofile")
+    import common  # evaluates the cfg
+    _mark("common")
+    import alignment
+    _mark("alignment")
+    import governor
+    _mark("governor")
+    import scheduler
+    _mark("scheduler")
+    import frame
+    _mark("frame")
+    import leddriver
+    _mark("leddriver")
+    from rtcstate import RTCState, WakeRecord
+    _mark("rtcstate")
+    state = RTCState().load()
+    if not state.valid:
+        return False
+    wake = WakeRecord(state.wake).read()
+    if scheduler.pending(state.jobs, wake):
+        return False  # the jobs, e.g. the syncs, need the external RTC and maybe the network
+    from machine import Pin
+    if Pin(32, Pin.IN).value():
+        return False  # touched while waking, show the modes
+    from common import get_main_cfg, get_animation_cfg, get_granularity_cfg
+    if get_main_cfg()[0]:
+        return False  # debug mode never sleeps
+    _mark("state")
+    wakeprofile.end(wakeprofile.IMPORTS)
+
+    from localtime import LocalTime
+    mytime = LocalTime()
+    h, m, ahead = alignment.upcoming_time(mytime)
+    step, minute_dots = get_granularity_cfg()
+    m, dots = alignment.shown_minute(m, step, minute_dots)
+    _mark("localtime")
+
+    from leddriver import Max7219Chain
+    matrix = Max7219Chain(1, cs_pinnr=27, sck_pinnr=14, mosi_pinnr=13, miso_pinnr=12, shadow=state.display)
+    _mark("matrix")
+    wakeprofile.end(wakeprofile.INIT)
+
+    if wake.light_due() and governor.allow(wake, governor.LIGHT):
+        from machine import I2C
+        from lightsensor import BH1750
+        supply_sensoren = Pin(33, Pin.OUT)
+        supply_sensoren.on()
+        lightsensor = BH1750(I2C(1, scl=Pin(25, pull=Pin.PULL_UP), sda=Pin(26, pull=Pin.PULL_UP), freq=100000))
+        _mark("lightsensor")
+        wake.brightness = lightsensor.get_light_level()
+        import darkhours
+        wake.luminance = darkhours.luminance(lightsensor)
+        wake.light_time = time.time()
+        supply_sensoren.off()
+    matrix.set_brightness(wake.brightness)
+    _mark("brightness")
+    wakeprofile.end(wakeprofile.LIGHT)
+
+    import darkhours
+    dark = darkhours.active(h, m, wake.luminance)
+    if dark:
+        matrix.set_shutdown(True)
+        wake.hour = -1  # shown again after the dark hours
+        wakeprofile.end(wakeprofile.FLUSH)
+    elif h != wake.hour or m + dots != wake.minute:
+        from frametable import FrameTable, add_minute_dots
+        frame = FrameTable().get_time_frame(h, m)
+        if frame is None:
+            wakeprofile.end(wakeprofile.FRAME)  # main.py goes on with its imports
+            wake.write()
+            state.save()  # main.py takes over the shadow of the intensity
+            return False  # and computes the frame
+        add_minute_dots(frame, dots)
+        alignment.frame_ready(wake, alignment.FAST)
+        _mark("frametable")
+        wakeprofile.end(wakeprofile.FRAME)
+        from animation import NAMES, NONE
+        kind = NAMES.get(get_animation_cfg(), NONE)
+        if kind != NONE:
+            from animation import Animator
+            animator = Animator(matrix)
+        if ahead:
+            alignment.wait_for_boundary(mytime)
+        matrix.set_shutdown(False)
+        if kind == NONE:
+            matrix.show_frame(frame)
+        else:
+            animator.start(kind, frame)
+        alignment.shown(mytime, wake)  # when the transition starts, not when it ends
+        if kind != NONE:
+            animator.wait()
+        wake.hour = h
+        wake.minute = m + dots
+        _mark("show")
+        wakeprofile.end(wakeprofile.FLUSH)
+
+    import esp32
+    esp32.wake_on_ext0(pin=Pin(32, Pin.IN), level=esp32.WAKEUP_ANY_HIGH)
+    if dark:
+        sleep_time = darkhours.seconds_to_sleep(mytime)
+    else:
+        sleep_time = alignment.seconds_to_sleep(mytime, wake, alignment.FAST, 1 if minute_dots else step,
+                                                scheduler.next_run(state.jobs))
+    governor.spent(wake)
+    wake.write()
+    report()
+    wakeprofile.end(wakeprofile.REST)
+    wakeprofile.store(state.profile, wakeprofile.FAST)
+    state.save()
+    print("deep-sleeping at", h, ":", m, "; sleeping", sleep_time)
+    machine.deepsleep(int(sleep_time * 1000))
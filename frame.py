@@ -0,0 +1,165 @@
+"""
+Mapping of the clock face onto the register buffer of the Max7219Chain.
+
+The buffer holds the 8 digit registers of each driver, driver after driver.
+How the pixels are wired to the drivers is described by a Geometry, which is
+compiled once into a lookup table pixel -> (byte index, bit mask).
+"""
+try:
+    from micropython import const
+except:
+    const = lambda v: v
+
+_UNWIRED = const(0xFF)
+
+
+class Geometry:
+    """Wiring of a rows x cols face onto a chain of chips MAX7219 drivers.
+
+    Each tile (chip, row, col, rows, cols, digit, rotation) is a block of
+    rows x cols pixels with its top left corner at (row, col), shown by driver
+    chip starting at digit register digit. Unrotated, the rows of the block
+    are digit registers and column n of the block is bit n. rotation turns
+    the block clockwise in steps of 90 degrees. Chip 0 is the driver next to
+    the microcontroller.
+    """
+
+    def __init__(self, rows, cols, chips, tiles):
+        self.rows = rows
+        self.cols = cols
+        self.chips = chips
+        self.frame_size = 8*chips
+        self.index = bytearray([_UNWIRED] * (rows*cols))
+        self.mask = bytearray(rows*cols)
+        self.bit = bytearray(rows*cols)
+        for chip, row, col, tile_rows, tile_cols, digit, rotation in tiles:
+            for dr in range(tile_rows):
+                for dc in range(tile_cols):
+                    if rotation == 0:
+                        d, bit = dr, dc
+                    elif rotation == 1:
+                        d, bit = dc, tile_rows - 1 - dr
+                    elif rotation == 2:
+                        d, bit = tile_rows - 1 - dr, tile_cols - 1 - dc
+                    else:
+                        d, bit = tile_cols - 1 - dc, dr
+                    if not (0 <= digit + d < 8 and 0 <= bit < 8 and 0 <= chip < chips):
+                        raise ValueError("Tile {} does not fit its driver".format((chip, row, col)))
+                    p = (row + dr)*cols + col + dc
+                    self.index[p] = chip*8 + digit + d
+                    self.mask[p] = 1 << bit
+                    self.bit[p] = bit
+        self.row_runs = tuple(self._compile_runs(r) for r in range(rows))
+        self.empty = bytes(self.frame_size)
+        full = bytearray(self.frame_size)
+        for p in range(rows*cols):
+            if self.index[p] != _UNWIRED:
+                full[self.index[p]] |= self.mask[p]
+        self.full = bytes(full)
+
+    def _compile_runs(self, r):
+        # (byte index, first column, columns, first bit) of the runs of neighbouring
+        # columns in row r, which are neighbouring bits of the same register
+        runs = []
+        for c in range(self.cols):
+            p = r*self.cols + c
+            if self.index[p] == _UNWIRED:
+                continue
+            if runs and runs[-1][0] == self.index[p] and runs[-1][1] + runs[-1][2] == c \
+                    and self.bit[p] == runs[-1][3] + runs[-1][2]:
+                runs[-1][2] += 1
+            else:
+                runs.append([self.index[p], c, 1, self.bit[p]])
+        return tuple(tuple(run) for run in runs)
+
+
+# Driver 0 and 1 show the upper 8 rows (left and right half), driver 2 shows
+# the lower 4 rows of both halves.
+CLOCK = Geometry(12, 14, 3, ((0, 0, 0, 8, 7, 0, 0),
+                             (1, 0, 7, 8, 7, 0, 0),
+                             (2, 8, 0, 4, 7, 0, 0),
+                             (2, 8, 7, 4, 7, 4, 0)))
+
+
+def register_position(r, c, geometry=CLOCK):
+    """Returns (byte index, bit) of pixel (r, c) in a frame buffer."""
+    p = r*geometry.cols + c
+    return geometry.index[p], geometry.bit[p]
+
+
+def pack_positions(positions, buf=None):
+    """Sets all [r, c] positions in buf (a new frame if None) and returns it."""
+    return Frame(buf).add_positions(positions).buffer
+
+
+class Frame:
+    """One screen of the clock face, stored in register order of the Max7219Chain."""
+
+    def __init__(self, buffer=None, geometry=CLOCK):
+        self.geometry = geometry
+        self.buffer = bytearray(geometry.frame_size) if buffer is None else buffer
+        self._index = geometry.index
+        self._mask = geometry.mask
+        self._rows = geometry.rows
+        self._cols = geometry.cols
+
+    def clear(self):
+        self.buffer[:] = self.geometry.empty
+        return self
+
+    def fill(self):
+        self.buffer[:] = self.geometry.full
+        return self
+
+    def set_pixel(self, r, c):
+        if not (0 <= r < self._rows and 0 <= c < self._cols):
+            return
+        p = r*self._cols + c
+        if self._index[p] != _UNWIRED:
+            self.buffer[self._index[p]] |= self._mask[p]
+
+    def get_pixel(self, r, c):
+        if not (0 <= r < self._rows and 0 <= c < self._cols):
+            return 0
+        p = r*self._cols + c
+        if self._index[p] == _UNWIRED:
+            return 0
+        return 1 if self.buffer[self._index[p]] & self._mask[p] else 0
+
+    def or_row(self, r, mask):
+        """Sets the pixels of row r where bit n of mask is set for column n."""
+        if 0 <= r < self.geometry.rows:
+            for index, col, cols, bit in self.geometry.row_runs[r]:
+                self.buffer[index] |= ((mask >> col) & ((1 << cols) - 1)) << bit
+
+    def blit(self, glyph, r, c):
+        """ORs the row bitmasks of glyph into the frame with its top left corner at (r, c)."""
+        for i in range(len(glyph)):
+            if c >= 0:
+                self.or_row(r + i, glyph[i] << c)
+            else:
+                self.or_row(r + i, glyph[i] >> -c)
+
+    def set_span(self, r, c, length):
+        self.or_row(r, ((1 << length) - 1) << c)
+
+    def load_rows(self, rows, stride):
+        """Replaces the frame with a bitmap of stride bytes per row, bit n of a
+        row being column n, like a framebuf.FrameBuffer in MONO_HMSB format."""
+        self.buffer[:] = self.geometry.empty
+        for r in range(self.geometry.rows):
+            i = r*stride
+            mask = 0
+            for k in range(stride):
+                mask |= rows[i + k] << (8*k)
+            self.or_row(r, mask)
+        return self
+
+    def add_positions(self, positions):
+        for pos in positions:
+            self.set_pixel(pos[0], pos[1])
+        return self
+
+    def positions(self):
+        """Returns all set pixels as a list of [r, c]."""
+        return [[r, c] for r in range(self.geometry.rows) for c in range(self._cols) if self.get_pixel(r, c)]
@@ -0,0 +1,66 @@
+"""
+Precompiled table with the display frame of every time of day.
+
+The table holds 12 * 60 frames of CLOCK.frame_size bytes, frame (h % 12) * 60 + m
+showing the text for h:m. Build it on the host with
+
+    python frametable.py
+
+and upload the resulting TABLE_FILE together with the sources.
+"""
+from frame import Frame
+
+TABLE_FILE = "timeframes.bin"
+MINUTE_DOTS = ((0, 0), (0, 1), (0, 2), (0, 3))  # top left corner, unused by all times
+
+
+def add_minute_dots(frame, dots):
+    """Sets the first dots of MINUTE_DOTS in frame, e.g. the minutes past a five-minute phrase."""
+    for r, c in MINUTE_DOTS[:dots]:
+        frame.set_pixel(r, c)
+    return frame
+
+
+class FrameTable:
+    def __init__(self, filename=TABLE_FILE):
+        self._filename = filename
+        self._frame = Frame()
+
+    def get_time_frame(self, hours, minutes):
+        """Returns the Frame for hours:minutes or None if the table is not available.
+
+        The returned Frame is reused by the next call."""
+        try:
+            with open(self._filename, "rb") as f:
+                size = len(self._frame.buffer)
+                f.seek(((hours % 12) * 60 + minutes) * size)
+                if f.readinto(self._frame.buffer) == size:
+                    return self._frame
+        except OSError:
+            pass
+        print("No precompiled frame for", hours, ":", minutes)
+        return None
+
+
+def build(filename=TABLE_FILE, matrix=None):
+    from textmatrix import TextFinder, CharacterMatrix
+    from frame import pack_positions
+    if matrix is None:
+        matrix = CharacterMatrix
+    finder = TextFinder()
+    with open(filename, "wb") as f:
+        for h in range(12):
+            for m in range(60):
+                texts = finder.get_time_texts(h, m)
+                positions = matrix.findTexts(texts)
+                if not positions:
+                    raise ValueError("Time {}:{} ({}) not found in matrix".format(h, m, texts))
+                for dot in MINUTE_DOTS:
+                    if list(dot) in positions:
+                        raise ValueError("Time {}:{} ({}) covers the minute dot {}".format(h, m, texts, dot))
+                f.write(pack_positions(positions))
+    print("Wrote", 12 * 60, "frames to", filename)
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,100 @@
+"""
+Energy budget of the periodic work, in awake milliseconds per hour.
+
+Every wake adds its awake time to the hour it ends in, kept in the
+WakeRecord. Optional work asks allow() first: it is deferred if its
+estimated cost does not fit into what is left of the budget of the hour,
+and the deferral is recorded for /metrics and the web page. The budget is
+"budget" in the config, in seconds per hour, 0 for no limit. Mode sessions
+after a touch are not counted, they are not periodic.
+"""
+import time
+
+import common
+
+LIGHT = 0  # brightness read of the BH1750
+EXT_RTC = 1  # sync from the external RTC
+NTP = 2  # a try to sync over NTP
+WEATHER = 3  # a try to refresh the weather
+NAMES = ("light", "ext_rtc", "ntp", "weather")
+COSTS_MS = (200, 50, 5000, 3000)  # estimated awake time of each, incl. connecting
+DEFER_S = 5*60  # deferred work is due again after this
+
+_start = 0  # ticks_ms of the wake, the reset for deep sleep
+_exempt_ms = 0  # of this wake, not counted
+_paused = None  # ticks_ms since the time is not counted
+
+
+def woke():
+    """Marks the wake from a light sleep, deep sleep wakes start at the reset."""
+    global _start, _exempt_ms
+    _start = time.ticks_ms()
+    _exempt_ms = 0
+
+
+def pause():
+    """Stops counting the awake time, e.g. for a mode session."""
+    global _paused
+    _paused = time.ticks_ms()
+
+
+def resume():
+    """Counts the awake time again."""
+    global _exempt_ms, _paused
+    _exempt_ms += time.ticks_diff(time.ticks_ms(), _paused)
+    _paused = None
+
+
+def _awake_ms():
+    now = time.ticks_ms() if _paused is None else _paused
+    return max(0, time.ticks_diff(now, _start) - _exempt_ms)
+
+
+def _roll(wake):
+    # starts the account of a new hour
+    hour = time.time() // 3600
+    if hour != wake.budget_hour:
+        wake.budget_hour = hour
+        wake.awake_last_hour_ms = wake.awake_ms
+        wake.awake_ms = 0
+        wake.deferred = 0
+        wake.deferrals = 0
+
+
+def remaining_ms(wake):
+    """Returns the awake ms left in the budget of this hour, None for no limit."""
+    budget = common.get_budget_cfg()
+    if not budget:
+        return None
+    _roll(wake)
+    return budget * 1000 - wake.awake_ms - _awake_ms()
+
+
+def allow(wake, job, cost_ms=None):
+    """Returns whether job, of COSTS_MS if no cost_ms, fits into the budget, records it as deferred if not."""
+    remaining = remaining_ms(wake)
+    if remaining is None or (COSTS_MS[job] if cost_ms is None else cost_ms) <= remaining:
+        return True
+    wake.deferred |= 1 << job
+    wake.deferrals = min(wake.deferrals + 1, 0xFFFF)
+    print("Budget: deferring", NAMES[job], "with", remaining, "ms left")
+    return False
+
+
+def spent(wake):
+    """Adds the awake time of this wake to its hour, before sleeping."""
+    _roll(wake)
+    wake.awake_wake_ms = min(_awake_ms(), 0xFFFF)
+    wake.awake_ms += wake.awake_wake_ms
+
+
+def status(wake):
+    """Returns the budget, its use including this wake and the deferrals of this hour, for /metrics
+    and the web page."""
+    _roll(wake)
+    return {"budget_ms": common.get_budget_cfg() * 1000,
+            "used_ms": wake.awake_ms + _awake_ms(),
+            "last_hour_ms": wake.awake_last_hour_ms,
+            "last_wake_ms": wake.awake_wake_ms,
+            "deferred": [NAMES[job] for job in range(len(NAMES)) if wake.deferred & 1 << job],
+            "deferrals": wake.deferrals}
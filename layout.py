@@ -0,0 +1,126 @@
+"""
+Layout compiler for the CharacterMatrix.
+
+Compiles a letter matrix into an index word -> ((row, col, len), ...) holding
+every occurrence of a word on a single row, in reading order. It checks that
+every phrase the TextFinder can ask for resolves and writes the index as
+INDEX_FILE, which CharacterMatrix imports instead of searching the letters
+at runtime. Select a layout on the host with
+
+    python layout.py [layout name]
+
+which also rebuilds the frame table (see frametable.py).
+"""
+import sys
+
+INDEX_FILE = "wordindex.py"
+ROW_LEN = 14
+
+LAYOUTS = {
+    "standard": ("BMINUSACHTNOLL",
+                 "EINZWOIVIERDRÜ",
+                 "ZWÖLFNÜNRFÖFÜF",
+                 "ESEBENSÄCHSEIS",
+                 "DRISGIVIERTELF",
+                 "ZWÄNZGZÄHKOMMA",
+                 "VORABUESCHALBI",
+                 "ELFINRACHTIDRÜ",
+                 "OKEISÄCHSINÜNI",
+                 "SEBNIGMNZÄHNIU",
+                 "FÜFISEBEZWÖLFI",
+                 "ZWOIEVIERIGRAD"),
+    "old": (" MINUSACHTNOLL",
+            "EINZWOIVIERDRÜ",
+            "ZWÖLFNÜN FÖFÜF",
+            "ESEBENSÄCHSEIS",
+            "DRISGIVIERTELF",
+            "ZWÄNZGZÄHKOMMA",
+            "VORAB ESCHALBI",
+            "ELFI RACHTIDRÜ",
+            " KEISÄCHSINÜNI",
+            "SEBNIG NZÄHNI ",
+            "FÜFISEBEZWÖLFI",
+            "ZWOI VIERIGRAD"),
+}
+
+
+def get_phrases(finder):
+    """All word lists the TextFinder may search for."""
+    phrases = []
+    for h in range(12):
+        for m in range(60):
+            phrases.append(finder.get_time_texts(h, m))
+    for sign in ([], [finder.MINUS]):
+        for before in finder.TEMP_BEFORE_DIGIT:
+            for after in finder.TEMP_AFTER_DIGIT:
+                after_texts = [finder.DOT] + after if after else []
+                phrases.append(sign + before + after_texts + [finder.DEGREE])
+    return phrases
+
+
+def compile_layout(rows, words):
+    """Returns the span index of all words in the matrix rows."""
+    spans = {}
+    for word in words:
+        word = word.upper()
+        found = []
+        for r, row in enumerate(rows):
+            c = row.find(word)
+            while c >= 0:
+                found.append((r, c, len(word)))
+                c = row.find(word, c + 1)
+        if not found:
+            raise ValueError("Word {} not found in layout".format(word))
+        spans[word] = tuple(found)
+    return spans
+
+
+def validate(matrix, phrases):
+    """Checks that every phrase resolves and matches the plain text search."""
+    for texts in phrases:
+        spans = matrix.findSpans(texts)
+        if not spans:
+            raise ValueError("Phrase {} does not fit in layout".format(" ".join(texts)))
+        positions = [(r, c + i) for r, c, length in spans for i in range(length)]
+        if positions != matrix.searchTexts(texts):
+            raise ValueError("Phrase {} resolves differently than the text search".format(" ".join(texts)))
+
+
+def write_index(name, rows, spans, filename=INDEX_FILE):
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("# Generated by layout.py from layout \"{}\", do not edit.\n".format(name))
+        f.write("LAYOUT = \"{}\"\n".format(name))
+        f.write("ROW_LEN = {}\n".format(ROW_LEN))
+        f.write("MATRIX = \"{}\"\n".format("".join(rows)))
+        f.write("SPANS = {\n")
+        for word in sorted(spans):
+            f.write("    \"{}\": {},\n".format(word, spans[word]))
+        f.write("}\n")
+    print("Wrote index of layout", name, "with", len(spans), "words to", filename)
+
+
+def build(name):
+    from textmatrix import CharacterMatrix, TextFinder
+    import frametable
+
+    rows = LAYOUTS[name]
+    for row in rows:
+        if len(row) != ROW_LEN:
+            raise ValueError("Row {} of layout {} is not {} letters long".format(row, name, ROW_LEN))
+
+    finder = TextFinder()
+    phrases = get_phrases(finder)
+    words = set(word for texts in phrases for word in texts)
+    spans = compile_layout(rows, words)
+
+    class LayoutMatrix(CharacterMatrix):
+        MATRIX = "".join(rows)
+        SPANS = spans
+
+    validate(LayoutMatrix, phrases)
+    write_index(name, rows, spans)
+    frametable.build(matrix=LayoutMatrix)
+
+
+if __name__ == "__main__":
+    build(sys.argv[1] if len(sys.argv) > 1 else "standard")
@@ -20,9 +20,15 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from micropython import const
-import framebuf
-from machine import Pin, SPI
+try:
+    from micropython import const
+except ImportError:
+    const = lambda v: v
+try:
+    import framebuf
+except ImportError:
+    framebuf = None  # e.g. on the host, the canvas is not available
+from frame import Frame, CLOCK
 
 _NOOP = const(0)
 _DIGIT0 = const(1)
@@ -32,93 +38,199 @@ _SCANLIMIT = const(11)
 _SHUTDOWN = const(12)
 _DISPLAYTEST = const(15)
 
+
+def shadow_size(geometry=CLOCK):
+    # shadow of the latched registers: digits like the buffer, intensity and
+    # shutdown of each driver, and a flag telling if the shadow is known
+    return geometry.frame_size + 2*geometry.chips + 1
+
+SHADOW_SIZE = shadow_size()
+
 class Max7219Chain:
-    def __init__(self, spi_nr, cs_pinnr, sck_pinnr=14, mosi_pinnr=13, miso_pinnr=12):
-        # self._spi = SPI(spi_nr, 5000000)  # (14 SK, 13 MOSI), 5'000'000
-        # self._spi = SPI(-1, baudrate=100000, sck=Pin(14), mosi=Pin(13), miso=Pin(0))
-        self._spi = SPI(spi_nr, 5000000, sck=Pin(sck_pinnr), mosi=Pin(mosi_pinnr), miso=Pin(miso_pinnr))  # (14 SK, 13 MOSI), 5'000'000
-        self._cs = Pin(cs_pinnr, Pin.OUT)
+    def __init__(self, spi_nr, cs_pinnr, sck_pinnr=14, mosi_pinnr=13, miso_pinnr=12, spi=None, cs=None, shadow=None, geometry=CLOCK):
+        # spi and cs replace the hardware objects, e.g. for benchmarks on the host
+        # shadow is a buffer of shadow_size(geometry) bytes, e.g. in RTC memory, mirroring
+        # what the drivers latch. If it is valid, the drivers are not initialized again.
+        # geometry describes the wiring of the pixels to the chain, see frame.Geometry
+        if spi is None or cs is None:
+            from machine import Pin, SPI
+        if spi is None:
+            # spi = SPI(spi_nr, 5000000)  # (14 SK, 13 MOSI), 5'000'000
+            # spi = SPI(-1, baudrate=100000, sck=Pin(14), mosi=Pin(13), miso=Pin(0))
+            spi = SPI(spi_nr, 5000000, sck=Pin(sck_pinnr), mosi=Pin(mosi_pinnr), miso=Pin(miso_pinnr))  # (14 SK, 13 MOSI), 5'000'000
+        if cs is None:
+            cs = Pin(cs_pinnr, Pin.OUT)
+        self._spi = spi
+        self._cs = cs
         self._cs.on()
-        self._buffer = bytearray(8*3)
-        self._initialize()
+        self._geometry = geometry
+        self._chips = geometry.chips
+        self._size = geometry.frame_size
+        self._shadow_intensity = self._size
+        self._shadow_shutdown = self._size + self._chips
+        self._shadow_valid = self._size + 2*self._chips
+        self._buffer = bytearray(self._size)
+        self._frame = Frame(self._buffer, geometry)
+        self._canvas = None
+        self._stride = (geometry.cols + 7) // 8
+        self._canvas_buf = bytearray(self._stride*geometry.rows)
+        self._tx = bytearray(2*self._chips)  # one register write for each driver in the chain
+        self._shadow = bytearray(shadow_size(geometry)) if shadow is None else shadow
+        if self._shadow[self._shadow_valid]:
+            self._buffer[:] = self._shadow[:self._size]
+            self.brightness = self._shadow[self._shadow_intensity]
+        else:
+            self.brightness = 15
+            self._initialize()
 
     def _initialize(self):
         for cmd, data in ((_SHUTDOWN, 0),
                           (_DISPLAYTEST, 0),
                           (_SCANLIMIT, 7),
-                          (_DECODEMODE, 0),
-                          (_SHUTDOWN, 1)):
+                          (_DECODEMODE, 0)):
             self._write_to_all(cmd, data)
+        for i in range(self._shadow_valid):
+            self._shadow[i] = 0xFF  # unknown, so that every register gets written
+        for chip in range(self._chips):
+            self._shadow[self._shadow_shutdown + chip] = 0
+        self._shadow[self._shadow_valid] = 1
+        self._write_shadowed(_SHUTDOWN, self._shadow_shutdown, 1)
         self.set_brightness(15)
-        self.show()
+        self.flush()
 
     def _write_to_all(self, command, data):
+        tx = self._tx
+        for pos in range(0, len(tx), 2):
+            tx[pos] = command
+            tx[pos + 1] = data
+        self._write_tx()
+
+    def _write_shadowed(self, command, shadow_offset, data):
+        # writes a control register of all drivers, unless all of them latch data already
+        changed = False
+        for chip in range(self._chips):
+            if self._shadow[shadow_offset + chip] != data:
+                self._shadow[shadow_offset + chip] = data
+                changed = True
+        if changed:
+            self._write_to_all(command, data)
+
+    def _write_tx(self):
+        # the first two bytes are shifted through to the last driver in the chain
         self._cs.off()
-        self._write_spi(command,data)
-        self._write_spi(command,data)
-        self._write_spi(command,data)
+        self._spi.write(self._tx)
         self._cs.on()
-        print("CMD:", command, data)
 
-    def _write_spi(self,c,d):
-        self._spi.write(bytearray([c,d]))
+    def flush(self):
+        """Sends the digit registers that differ from the shadow, one transaction each.
 
-    def show(self):
+        Drivers whose register is unchanged get a NOOP in that transaction."""
+        tx = self._tx
+        buf = self._buffer
+        shadow = self._shadow
+        last = self._chips - 1
         for digit_nr in range(8):
-            self._cs.off()
-            self._write_spi(_DIGIT0 + digit_nr, self._buffer[2*8+digit_nr])
-            self._write_spi(_DIGIT0 + digit_nr, self._buffer[ 8 +digit_nr])
-            self._write_spi(_DIGIT0 + digit_nr, self._buffer[digit_nr])
-            self._cs.on()
-        # print(self._buffer)
-        #self.reset_buffer()
+            changed = False
+            for chip in range(self._chips):
+                i = chip*8 + digit_nr
+                pos = 2*(last - chip)  # the first bytes reach the last driver
+                if buf[i] != shadow[i]:
+                    shadow[i] = buf[i]
+                    tx[pos] = _DIGIT0 + digit_nr
+                    tx[pos + 1] = buf[i]
+                    changed = True
+                else:
+                    tx[pos] = _NOOP
+                    tx[pos + 1] = 0
+            if changed:
+                self._write_tx()
+
+    def invalidate(self):
+        """Forgets the shadow, so that the next flush writes all digits."""
+        for i in range(self._size):
+            self._shadow[i] = ~self._buffer[i] & 0xFF
+
+    def show(self):
+        self.flush()
 
     def set_brightness(self, brightness):
         if brightness > 15:
             brightness = 15
         if brightness < 1:
             brightness = 1
-        self._write_to_all(_INTENSITY, brightness)
+        self.brightness = brightness
+        self.write_intensity(brightness)
+
+    def write_intensity(self, level):
+        # sets the intensity register without changing the brightness, e.g. for fades
+        self._write_shadowed(_INTENSITY, self._shadow_intensity, level)
+
+    def set_shutdown(self, shutdown):
+        # the drivers keep their digits while shut down
+        self._write_shadowed(_SHUTDOWN, self._shadow_shutdown, 0 if shutdown else 1)
+
+    @property
+    def frame(self):
+        return self._frame
+
+    @property
+    def canvas(self):
+        """framebuf.FrameBuffer with one pixel per LED, (x, y) being (column, row).
+
+        Draw on it with text, blit, fill_rect, scroll etc. and call show_canvas()
+        to show it. Needs the framebuf module of MicroPython."""
+        if self._canvas is None:
+            if framebuf is None:
+                raise RuntimeError("framebuf not available")
+            self._canvas = framebuf.FrameBuffer(self._canvas_buf, self._geometry.cols, self._geometry.rows, framebuf.MONO_HMSB)
+        return self._canvas
+
+    def show_canvas(self):
+        # the canvas is remapped to register order only here
+        self._frame.load_rows(self._canvas_buf, self._stride)
+        self.flush()
 
     def reset_buffer(self):
-        self._buffer = bytearray(8*3)
+        self._frame.clear()
 
     def add_pixels(self, positions):
         for pos in positions:
             self.add_pixel(pos[0], pos[1])
 
     def add_led(self, lednr):
-        self.add_pixel(lednr // 14, lednr % 14)
+        self.add_pixel(lednr // self._geometry.cols, lednr % self._geometry.cols)
 
     def add_pixel(self, r, c):
-        if r < 8:
-            driver_nr = c // 7
-            digit_nr = r
-        else:
-            driver_nr = 2
-            if c<7:
-                digit_nr = r - 8
-            else:
-                digit_nr = r - 4
-        offset = c % 7
-        #print("->", driver_nr, digit_nr, offset, driver_nr*8 + digit_nr)
-        self._buffer[driver_nr*8 + digit_nr] |= 1 << offset
-        self.show()
+        # only changes the buffer, call flush() to show it
+        self._frame.set_pixel(r, c)
 
     def show_pixels(self, positions):
         # print("showing", positions)
         self.reset_buffer()
         self.add_pixels(positions)
-        self.show()
+        self.flush()
+
+    def show_frame(self, frame):
+        # frame is a Frame from TextFinder or FrameTable, already in register order
+        self._buffer[:] = frame.buffer
+        self.flush()
 
 def demo():
-    m=MatrixDrivers(1,15)
+    m=Max7219Chain(1,15)
     import time
-    for i in range(12*14):
+    for i in range(CLOCK.rows*CLOCK.cols):
         #m.reset_buffer()
         m.add_led(i)
+        m.flush()
         time.sleep(0.1)
         #time.sleep(0.2)
     time.sleep(1)
+    canvas = m.canvas
+    text = "Tegschtuhr"
+    for x in range(CLOCK.cols, -8*len(text), -1):
+        canvas.fill(0)
+        canvas.text(text, x, 2, 1)
+        m.show_canvas()
+        time.sleep(0.05)
     m.reset_buffer()
-    m.show()
+    m.flush()
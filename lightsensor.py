@@ -29,6 +29,7 @@ class BH1750():
         self.bus = i2cbus
         # print(self.bus)
         self.addr = addr
+        self.last_luminance = None  # lux of the last measurement
         try:
             self.off()
             self.reset()
@@ -68,10 +69,18 @@ class BH1750():
             sleep_ms(24 if mode in (0x13, 0x23) else 180)
             data = self.bus.readfrom(self.addr, 2)
             factor = 2.0 if mode in (0x11, 0x21) else 1.0
-            return (data[0]<<8 | data[1]) / (1.2 * factor)
+            self.last_luminance = (data[0]<<8 | data[1]) / (1.2 * factor)
+            return self.last_luminance
         else:
             return 666
 
+    def measured_luminance(self):
+        """Returns the lux of the last measurement, measuring if there was none, or None if the
+        sensor is not connected."""
+        if self.last_luminance is None and self.connected:
+            self.luminance()
+        return self.last_luminance
+
     def get_light_level(self):
         if self.connected:
             min_level, min_lum, max_level, max_lum = common.get_luminance_cfg()
@@ -1,13 +1,21 @@
-from externalrtc import DS1307
 from machine import RTC
-import ntptime
 import utime
 
 class LocalTime:
-    def __init__(self, i2c):
-        self._external_rtc = DS1307(i2c)
+    def __init__(self, i2c=None):
+        # without i2c only the internal RTC is used, e.g. on a fast wake; i2c
+        # can be a function returning the bus, called when the external RTC is used
+        self._i2c = i2c
+        self._ds1307 = None
         self._internal_rtc = RTC()
 
+    @property
+    def _external_rtc(self):
+        if self._ds1307 is None:
+            from externalrtc import DS1307
+            self._ds1307 = DS1307(self._i2c() if callable(self._i2c) else self._i2c)
+        return self._ds1307
+
     def sync_from_external_RTC(self):
         try:
             self._internal_rtc.datetime(self._external_rtc.datetime())
@@ -18,15 +26,43 @@ class LocalTime:
 
     def sync_from_ntp(self):
         try:
+            import ntptime
             ntptime.settime()
         except:
             return False
+        self._store_to_external_RTC()
+        return True
+
+    async def sync_from_ntp_async(self):
+        # like ntptime.settime(), but waits for the answer without blocking other uasyncio tasks
+        import ntptime
+        import uasyncio
+        import usocket
+        import ustruct
+        query = bytearray(48)
+        query[0] = 0x1B
+        sock = usocket.socket(usocket.AF_INET, usocket.SOCK_DGRAM)
+        try:
+            sock.setblocking(False)
+            sock.sendto(query, usocket.getaddrinfo(ntptime.host, 123)[0][-1])
+            msg = await uasyncio.StreamReader(sock).read(48)
+        except OSError:
+            return False
+        finally:
+            sock.close()
+        if len(msg) < 48:
+            return False
+        tm = utime.gmtime(ustruct.unpack("!I", msg[40:44])[0] - ntptime.NTP_DELTA)
+        self._internal_rtc.datetime((tm[0], tm[1], tm[2], tm[6] + 1, tm[3], tm[4], tm[5], 0))
+        self._store_to_external_RTC()
+        return True
+
+    def _store_to_external_RTC(self):
         try:
             self._external_rtc.datetime(self._internal_rtc.datetime())
         except:
             print("Failed to set NTP time in external RTC")
             pass
-        return True
 
     @property
     def local_datetime(self):
@@ -40,6 +76,14 @@ class LocalTime:
         _, _, h, m = self.local_datetime
         return h, m
 
+    def time_in(self, seconds):
+        # local hour and minute in seconds from now, e.g. of the next minute
+        y, mo, d, wd, h, mi, s, _ = self._internal_rtc.datetime()
+        y = max(y, 2000)
+        y, mo, d, h, mi, s, wd, yd = utime.localtime(utime.mktime((y, mo, d, h, mi, s, wd, 0)) + seconds)
+        y, mo, d, h, mi, s, wd, yd = utime.localtime(utime.mktime((y, mo, d, h, mi, s, wd, 0)) + 3600 + 3600*self.daylight_saving(mo, d, wd, h))
+        return h, mi
+
     @property
     def seconds_to_next_minute(self):
         _, _, _, _, _, _, s, us = self._internal_rtc.datetime()
@@ -1,20 +1,48 @@
-import time
 import machine
+if machine.reset_cause() == machine.DEEPSLEEP_RESET and machine.wake_reason() == machine.TIMER_WAKE:
+    import fastwake
+    fastwake.run()  # only returns if the time has to be shown below
+    fastwake.report()
+
+import time
 from machine import I2C, Pin
 
 from leddriver import Max7219Chain
 from textmatrix import TextFinder
+from frametable import FrameTable, add_minute_dots
+from frame import Frame
+from animation import Animator, NAMES as ANIMATIONS, NONE
 from lightsensor import BH1750
 from touch import TouchSensor
 from localtime import LocalTime
+from rtcstate import RTCState, WakeRecord
+import wakeprofile
+import alignment
+import governor
+import darkhours
+from scheduler import Job, Scheduler, next_run
 
-from common import get_main_cfg, get_custompos_cfg
+from common import get_main_cfg, get_custompos_cfg, get_animation_cfg, get_stream_cfg, get_sleep_cfg, get_granularity_cfg, get_worker_cfg
 
 CURRENT_MODE = 0  # 0: Time, 1: Temperature, 2: Humidity
 mode_timeoutstamp = 0
 current_version = ""
 latest_version = ""
+ambient = None
+weather = None
+portal = None
+otaUpdater = None
+worker = None  # NetWorker of the network jobs, if enabled
+RTC_SYNC_INTERVAL_S = 5*60  # the internal RTC drifts in deep sleep
+NTP_SYNC_INTERVAL_S = 24*60*60  # at 0:00 UTC
+WEATHER_MAX_AGE_S = 3*60*60
+NTP_TIMEOUT_MS = 5000
+VERSION_TIMEOUT_S = 5
+WEATHER_TIMEOUT_S = 5  # the request blocks the uasyncio tasks, at most this long per read
+WORKER_RETRIES = 5
 DEBUG_MODE, MODE_TIMEOUT_MS = get_main_cfg()
+ANIMATION = ANIMATIONS.get(get_animation_cfg(), NONE)
+wakeprofile.end(wakeprofile.IMPORTS)
 
 # import credentials
 # credentials.Creds().remove()
@@ -23,140 +51,408 @@ def update_timeout():
     global mode_timeoutstamp
     mode_timeoutstamp = time.ticks_ms() + MODE_TIMEOUT_MS
 
+# The state in RTC memory, e.g. what the display drivers latch, is only valid after deep sleep
+state = RTCState()
+wake = WakeRecord(state.wake)
+if machine.reset_cause() == machine.DEEPSLEEP_RESET and state.load().valid:
+    wake.read()
+
 #Initialize Hardware
-matrix = Max7219Chain(1, cs_pinnr=27, sck_pinnr=14, mosi_pinnr=13, miso_pinnr=12)
-i2c = I2C(1, scl=Pin(25, pull=Pin.PULL_UP), sda=Pin(26, pull=Pin.PULL_UP), freq=100000)
+matrix = Max7219Chain(1, cs_pinnr=27, sck_pinnr=14, mosi_pinnr=13, miso_pinnr=12, shadow=state.display)
+i2c = None  # the sensor bus, see get_i2c()
+lightsensor = None
 supply_sensoren = Pin(33, Pin.OUT)
-supply_sensoren.on()
 textfinder = TextFinder()
-mytime = LocalTime(i2c)
-lightsensor = BH1750(i2c)
+custom_frame = Frame()
+animator = Animator(matrix)
+wakeprofile.end(wakeprofile.INIT)
+
+def get_i2c():
+    # powers the sensors and sets up their bus when the first one is used
+    global i2c
+    if i2c is None:
+        supply_sensoren.on()
+        i2c = I2C(1, scl=Pin(25, pull=Pin.PULL_UP), sda=Pin(26, pull=Pin.PULL_UP), freq=100000)
+    return i2c
+
+def get_lightsensor():
+    global lightsensor
+    if lightsensor is None:
+        lightsensor = BH1750(get_i2c())
+    return lightsensor
+
+def update_brightness():
+    # the brightness of an earlier wake is kept until it gets too old
+    if wake.light_due() and governor.allow(wake, governor.LIGHT):
+        wake.brightness = get_lightsensor().get_light_level()
+        wake.luminance = darkhours.luminance(lightsensor)
+        wake.light_time = time.time()
+    matrix.set_brightness(wake.brightness)
 
-matrix.set_brightness(lightsensor.get_light_level())
+mytime = LocalTime(get_i2c)
+update_brightness()
+wakeprofile.end(wakeprofile.LIGHT)
+
+def rtc_job():
+    wakeprofile.end(wakeprofile.REST)  # what ran before the job, e.g. showing the time
+    synced = mytime.sync_from_external_RTC()
+    if not synced:
+        schedule.trigger(NTP_JOB)  # the time has no other source
+    wakeprofile.end(wakeprofile.EXT_RTC)
+    return synced
+
+def ntp_job():
+    global portal
+    wakeprofile.end(wakeprofile.REST)
+    if portal is None:
+        from captive_portal import CaptivePortal
+        portal = CaptivePortal(get_measurements_for_web, matrix.set_brightness, update_for_web)
+    synced = portal.try_connect_from_file() and mytime.sync_from_ntp()
+    print("Time Synched over NTP" if synced else "Failed to Sync Time over NTP")
+    wakeprofile.end(wakeprofile.NETWORK)
+    return synced
+
+RTC_JOB = Job(0, "rtc", RTC_SYNC_INTERVAL_S, rtc_job, governor.EXT_RTC, deadline_s=30*60)
+NTP_JOB = Job(1, "ntp", NTP_SYNC_INTERVAL_S, ntp_job, governor.NTP, deadline_s=6*60*60)
+schedule = Scheduler(state.jobs, wake, (RTC_JOB, NTP_JOB))
 
 if machine.reset_cause() == machine.DEEPSLEEP_RESET:
     print("Woke from deep sleep...")
-else:
-    mytime.sync_from_external_RTC()
+elif schedule.run(RTC_JOB):
+    schedule.done(NTP_JOB)  # the external RTC has kept the time, NTP at the next 0:00 UTC
+
+def store_weather():
+    wake.current_temp = weather.current_temp
+    wake.forecast_temp = weather.forecast_temp
+    wake.weather_icon = weather.forecast_icon
+    wake.weather_time = time.time()
+
+def restore_weather():
+    # the weather of an earlier wake is shown until it gets too old
+    if wake.weather_icon != 0xFF and time.time() - wake.weather_time < WEATHER_MAX_AGE_S:
+        weather.set_data(wake.current_temp, wake.forecast_temp, wake.weather_icon)
 
 def get_measurements_for_web():
-    return ambient.temperature, ambient.humidity, ambient.pressure, lightsensor.luminance(), current_version, latest_version
+    return ambient.temperature, ambient.humidity, ambient.pressure, get_lightsensor().luminance(), current_version, latest_version
 
 def update_for_web():
+    if worker is not None:
+        worker.submit("ota", get_ota_updater().download_version_and_reset, latest_version)
+        return  # the portal keeps answering while it downloads
     try:
-        otaUpdater.download_version_and_reset(latest_version)
+        get_ota_updater().download_version_and_reset(latest_version)
     except:
         pass
 
-def mode_switch():
+def next_mode():
     global CURRENT_MODE
+    if (weather.got_data and CURRENT_MODE >= 8) or (not weather.got_data and CURRENT_MODE >= 5):
+        CURRENT_MODE = 0
+    else:
+        CURRENT_MODE = CURRENT_MODE + 1
+
+def mode_switch(taps=1):
+    # called by the TouchSensor after the IRQ, rapid taps come as one call
+    if ambient is None:
+        return  # a touch outside of a mode session
     update_timeout()
+    for _ in range(taps - 1):
+        next_mode()  # skipped screens are not drawn
 
     print("Mode Switch!", CURRENT_MODE)
-    positions=[]
     if CURRENT_MODE == 0:
-        positions = textfinder.get_temperature_positions(ambient.temperature)
+        frame = textfinder.get_temperature_frame(ambient.temperature)
     elif CURRENT_MODE == 1:
-        positions = textfinder.get_humidity_positions(ambient.humidity)
+        frame = textfinder.get_humidity_frame(ambient.humidity)
     elif CURRENT_MODE == 2:
-        positions = textfinder.get_luminance_position(lightsensor.luminance())
+        wake.luminance = get_lightsensor().luminance()
+        frame = textfinder.get_luminance_frame(wake.luminance)
     elif CURRENT_MODE == 3:
-        positions = textfinder.get_date_positions(*(mytime.date))
+        frame = textfinder.get_date_frame(*(mytime.date))
     elif CURRENT_MODE == 4:
-        positions = get_custompos_cfg()
+        frame = custom_frame.clear().add_positions(get_custompos_cfg())
     elif weather.got_data and CURRENT_MODE == 5:
-        positions = textfinder.get_temperature_positions(weather.current_temp)
+        frame = textfinder.get_temperature_frame(weather.current_temp)
     elif weather.got_data and CURRENT_MODE == 6:
-        positions = textfinder.get_temperature_positions(weather.forecast_temp)
+        frame = textfinder.get_temperature_frame(weather.forecast_temp)
     elif weather.got_data and CURRENT_MODE == 7:
-        positions = textfinder.get_weather_positions(weather.forecast_icon)
-    elif (weather.got_data and CURRENT_MODE >= 8) or (not weather.got_data and CURRENT_MODE >= 5):
-        for y in range(14):
-            positions += [[x,y] for x in range(12)]
-    matrix.show_pixels(positions)
-    if (weather.got_data and CURRENT_MODE >= 8) or (not weather.got_data and CURRENT_MODE >= 5):
-        CURRENT_MODE = 0
+        frame = textfinder.get_weather_frame(weather.forecast_icon)
     else:
-        CURRENT_MODE = CURRENT_MODE + 1
+        frame = custom_frame.fill()
+    animator.start(ANIMATION, frame)
+    next_mode()
 
     update_timeout()
 
-touchsensor = TouchSensor(32, mode_switch)
-if DEBUG_MODE or touchsensor.is_pressed():
+def mode_session():
+    # the mode screens on touch and the portal, until MODE_TIMEOUT_MS without interaction
+    global ambient, weather, portal
+    governor.pause()
     try:
         from ambient import BME280
         from weather import Weather
-        ambient = BME280(i2c)
+        ambient = BME280(get_i2c())
         weather = Weather()
+        restore_weather()
+        wake.hour = -1  # the mode screens replace the time
+        matrix.set_shutdown(False)
 
         mode_switch()
 
-        from captive_portal import CaptivePortal
-        portal = CaptivePortal(get_measurements_for_web, matrix.set_brightness, update_for_web)
-        if portal.start(MODE_TIMEOUT_MS):
-            update_timeout()
-            time_synced = False
-            weather_synced = False
-            version_synced = False
-            retry_weather = 0
-
-            while time.ticks_ms() < mode_timeoutstamp:
-                if not time_synced:
-                    if mytime.sync_from_ntp():
-                        print("Time Synched over NTP")
-                        time_synced = True
-                    else:
-                        print("Failed to Sync Time over NTP")
-                if retry_weather < 10 and not weather_synced:
-                    if weather.update():
-                        print("Weather Updated.")
-                        weather_synced = True
-                    else:
-                        print("Failed to Sync Weather ("+str(retry_weather)+")")
-                        retry_weather = retry_weather + 1
-                if not version_synced:
-                    try:
-                        otaUpdater
-                    except NameError:
-                        from ota_updater import OTAUpdater
-                        otaUpdater = OTAUpdater('https://github.com/chrismue/tegschtuhr', main_dir="")
-                    version_synced, current_version, latest_version = otaUpdater.check_for_new_version()
-                    print("Version", current_version, latest_version)
-                if portal.handle_socket_events():
-                    update_timeout()
+        if portal is None:
+            from captive_portal import CaptivePortal
+            portal = CaptivePortal(get_measurements_for_web, matrix.set_brightness, update_for_web)
+        import uasyncio as asyncio
+        asyncio.run(portal_session())
     except Exception as e:
         print("Error", repr(e), "in Mode Initialisation...")
+    governor.resume()
+    wakeprofile.end(wakeprofile.NETWORK)
 
-h, m = mytime.time
-print("Finding", h, ":", m)
-positions = textfinder.get_time_positions(h,m)
-matrix.show_pixels(positions)
-CURRENT_MODE = 0
+async def portal_session():
+    # the portal and the network work as uasyncio tasks, until MODE_TIMEOUT_MS without a request or touch
+    global worker
+    import uasyncio as asyncio
+    update_timeout()
+    stream_matrix = None
+    if get_stream_cfg():
+        animator.stop()  # the streamed frames replace the mode screens
+        stream_matrix = matrix
+    tasks = [asyncio.create_task(portal.serve(stream_matrix))]
+    import networker
+    if get_worker_cfg() and networker.AVAILABLE:
+        if worker is None:
+            worker = networker.NetWorker()
+        tasks.append(asyncio.create_task(worker_task()))
+    else:
+        tasks += [asyncio.create_task(ntp_task()),
+                  asyncio.create_task(weather_task()),
+                  asyncio.create_task(version_task())]
+    requests = portal.requests
+    while time.ticks_diff(mode_timeoutstamp, time.ticks_ms()) > 0:
+        await asyncio.sleep_ms(100)
+        if portal.requests != requests:
+            requests = portal.requests
+            update_timeout()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)  # let them clean up
 
-if m % 5 == 0:
-    rtc_sync_successful = mytime.sync_from_external_RTC()
-    if not rtc_sync_successful or (h==1 and m==0):  # sync over NTP once a day
+async def wait_for_wifi():
+    import uasyncio as asyncio
+    while not portal.sta_if.isconnected():
+        await asyncio.sleep_ms(500)
+
+async def ntp_task():
+    import uasyncio as asyncio
+    await wait_for_wifi()
+    backoff_ms = 1000
+    while True:
         try:
-            portal  # check if CaptivePortal already initialized and port in use
-        except NameError:
-            from captive_portal import CaptivePortal
-            portal = CaptivePortal(get_measurements_for_web, matrix.set_brightness, update_for_web)
-        if portal.try_connect_from_file():
-            connected_time = time.ticks_ms()
-            synced_once = False
-            while not synced_once and time.ticks_ms() < connected_time + 10000:
-                if mytime.sync_from_ntp():
-                    print("Time Synched over NTP")
-                    synced_once = True
-                else:
-                    print("Failed to Sync Time over NTP")
-                time.sleep(0.3)
-
-
-# sleep until next minute
-touchsensor.configure_for_wakeup()
-sleep_time = max(0.1, mytime.seconds_to_next_minute - 2)  # subtract 1 second for boot up
-if not DEBUG_MODE:
-    print("deep-sleeping at", h, ":", m, "; sleeping", sleep_time)
+            if await asyncio.wait_for_ms(mytime.sync_from_ntp_async(), NTP_TIMEOUT_MS):
+                print("Time Synched over NTP")
+                schedule.done(NTP_JOB)
+                return
+        except asyncio.TimeoutError:
+            pass
+        print("Failed to Sync Time over NTP")
+        if not governor.allow(wake, governor.NTP):
+            return
+        await asyncio.sleep_ms(backoff_ms)
+        backoff_ms = min(2*backoff_ms, 30000)
+
+async def weather_task():
+    # weather.update() blocks while its request is running, up to WEATHER_TIMEOUT_S per read,
+    # the tasks only run in between
+    import uasyncio as asyncio
+    if weather.got_data:
+        return
+    await wait_for_wifi()
+    for retry_weather in range(10):
+        if not governor.allow(wake, governor.WEATHER):
+            return  # the weather of an earlier wake, if any, stays
+        if weather.update(WEATHER_TIMEOUT_S):
+            print("Weather Updated.")
+            store_weather()
+            return
+        print("Failed to Sync Weather ("+str(retry_weather)+")")
+        await asyncio.sleep_ms(1000 << min(retry_weather, 5))
+
+def get_ota_updater():
+    global otaUpdater
+    if otaUpdater is None:
+        from ota_updater import OTAUpdater
+        otaUpdater = OTAUpdater('https://github.com/chrismue/tegschtuhr', main_dir="", timeout=VERSION_TIMEOUT_S)
+    return otaUpdater
+
+async def version_task():
+    global current_version, latest_version
+    import uasyncio as asyncio
+    await wait_for_wifi()
+    backoff_ms = 1000
+    while True:
+        version_synced, current_version, latest_version = get_ota_updater().check_for_new_version()
+        print("Version", current_version, latest_version)
+        if version_synced:
+            return
+        await asyncio.sleep_ms(backoff_ms)
+        backoff_ms = min(2*backoff_ms, 30000)
+
+async def worker_task():
+    # NTP, the weather and the version check on the thread of the NetWorker, so that they
+    # don't block the portal and the touches. Failed jobs are submitted again after a backoff.
+    global current_version, latest_version
+    import uasyncio as asyncio
+    await wait_for_wifi()
+    functions = {"ntp": mytime.sync_from_ntp, "version": get_ota_updater().check_for_new_version}
+    if not weather.got_data and governor.allow(wake, governor.WEATHER):
+        functions["weather"] = lambda: weather.update(WEATHER_TIMEOUT_S)
+    for name in functions:
+        worker.submit(name, functions[name])
+    failures = {}
+    retry_at = {}
+    while functions:
+        await asyncio.sleep_ms(100)
+        for name, ok, result in worker.take():
+            if name not in functions:
+                print("Network job", name, ok, result)  # e.g. an OTA download that failed
+                continue
+            if name == "version" and ok:
+                ok, current_version, latest_version = result
+                print("Version", current_version, latest_version)
+            if ok and result:
+                print("Network job", name, "done")
+                if name == "ntp":
+                    schedule.done(NTP_JOB)
+                elif name == "weather":
+                    store_weather()
+                del functions[name]
+                continue
+            failures[name] = failures.get(name, 0) + 1
+            if failures[name] >= WORKER_RETRIES:
+                print("Network job", name, "failed")
+                del functions[name]
+            else:
+                retry_at[name] = time.ticks_add(time.ticks_ms(), 1000 << failures[name])
+        for name in list(retry_at):
+            if time.ticks_diff(time.ticks_ms(), retry_at[name]) >= 0:
+                del retry_at[name]
+                if name == "weather" and not governor.allow(wake, governor.WEATHER):
+                    del functions[name]  # the weather of an earlier wake, if any, stays
+                    continue
+                worker.submit(name, functions[name])
+
+def show_time(path=None):
+    # path of the wake for the latency estimate of alignment, None after a mode session
+    global CURRENT_MODE
+    h, m, ahead = alignment.upcoming_time(mytime)
+    m, dots = alignment.shown_minute(m, *get_granularity_cfg())
+    if h == wake.hour and m + dots == wake.minute:
+        print("Still showing", h, ":", m)  # e.g. woke before the minute changed
+        wakeprofile.end(wakeprofile.FRAME)
+    else:
+        print("Finding", h, ":", m)
+        frame = FrameTable().get_time_frame(h, m)
+        if frame is None:
+            frame = textfinder.get_time_frame(h, m)
+        add_minute_dots(frame, dots)
+        if path is not None:
+            alignment.frame_ready(wake, path)
+        wakeprofile.end(wakeprofile.FRAME)
+        if ahead:
+            alignment.wait_for_boundary(mytime, path is not None)  # the WiFi of a session stays up
+        matrix.set_shutdown(False)
+        animator.start(ANIMATION, frame)
+        if path is not None:
+            alignment.shown(mytime, wake)  # when the transition starts, not when it ends
+        animator.wait()
+        wakeprofile.end(wakeprofile.FLUSH)
+        wake.hour = h
+        wake.minute = m + dots
+    CURRENT_MODE = 0
+
+def dark_now():
+    return not DEBUG_MODE and darkhours.active(*mytime.time, wake.luminance)
+
+def dark_touch():
+    # a touch in the dark hours shows the time for a moment, another touch the mode screens
+    show_time()
+    deadline = time.ticks_add(time.ticks_ms(), darkhours.SHOW_MS)
+    released = False
+    while time.ticks_diff(deadline, time.ticks_ms()) > 0:
+        pressed = touchsensor.is_pressed()
+        if released and pressed:
+            mode_session()
+            show_time()
+            return
+        released = released or not pressed
+        time.sleep_ms(50)
+
+def show_wake(touched, path):
+    # what a wake shows: the time, the mode screens on a touch, nothing in the dark hours
+    if dark_now():
+        if touched:
+            dark_touch()
+    elif DEBUG_MODE or touched:
+        mode_session()
+        show_time()
+    else:
+        show_time(path)
+
+def seconds_to_sleep(path):
+    # until the next minute or step of the granularity, shutting the display down for a long
+    # sleep in the dark hours
+    if dark_now():
+        matrix.set_shutdown(True)
+        wake.hour = -1  # shown again after the dark hours
+        return darkhours.seconds_to_sleep(mytime)
+    step, minute_dots = get_granularity_cfg()
+    return alignment.seconds_to_sleep(mytime, wake, path, 1 if minute_dots else step, next_run(state.jobs))
+
+def deep_sleep():
+    # sleep until next minute, main.py (or fastwake.py) runs again on the wake
+    touchsensor.configure_for_wakeup()
+    sleep_time = seconds_to_sleep(alignment.FAST)
+    print("deep-sleeping at", wake.hour, ":", wake.minute, "; sleeping", sleep_time)
     supply_sensoren.off()
+    governor.spent(wake)
+    wake.write()
+    wakeprofile.end(wakeprofile.REST)
+    wakeprofile.store(state.profile, wakeprofile.FULL)
+    state.save()
     machine.deepsleep(int(sleep_time * 1000))  # deepsleep uses milliseconds
+
+def resident_loop():
+    # light sleeps until the next minute or a touch, keeping the program, the hardware
+    # objects and the sensors alive. Returns if the config switches to deep sleep.
+    while get_sleep_cfg() == "light":
+        if portal is not None:
+            portal.sta_if.active(False)  # the radio, which deep sleep switches off
+            portal.ap_if.active(False)
+        touchsensor.configure_for_wakeup()
+        sleep_time = seconds_to_sleep(alignment.RESIDENT)
+        governor.spent(wake)
+        wake.write()
+        wakeprofile.end(wakeprofile.REST)
+        wakeprofile.store(state.profile, wakeprofile.RESIDENT)
+        state.save()  # for /metrics, and the display shadow after a deep sleep
+        machine.lightsleep(int(sleep_time * 1000))
+
+        alignment.woke()
+        governor.woke()
+        wakeprofile.begin()
+        touched = touchsensor.is_pressed()
+        update_brightness()
+        wakeprofile.end(wakeprofile.LIGHT)
+        show_wake(touched, alignment.RESIDENT)
+        schedule.run_due()
+
+touchsensor = TouchSensor(32, mode_switch)
+wakeprofile.end(wakeprofile.INIT)
+show_wake(touchsensor.is_pressed(), alignment.FULL)
+schedule.run_due()
+
+if not DEBUG_MODE:
+    if get_sleep_cfg() == "light":
+        resident_loop()
+    deep_sleep()
@@ -0,0 +1,221 @@
+"""
+Simulated MAX7219 chain for running the display path on the host.
+
+SimSPI and SimPin replace the SPI bus and the CS pin of the Max7219Chain.
+The bytes written while CS is low are shifted through the drivers of the
+chain and latched when CS goes high, like on the hardware. The registers of
+every driver are decoded into a virtual framebuffer, which is rendered with
+the letters of the CharacterMatrix, and the SPI traffic is counted.
+
+    python max7219sim.py [--update]
+
+renders every mode of the clock, prints the traffic per frame and compares
+the frames with GOLDEN_FILE (or rewrites it with --update).
+"""
+import sys
+
+from frame import CLOCK
+
+GOLDEN_FILE = "golden_frames.txt"
+
+_NOOP = 0
+_DIGIT0 = 1
+_DIGIT7 = 8
+_DECODEMODE = 9
+_INTENSITY = 10
+_SCANLIMIT = 11
+_SHUTDOWN = 12
+_DISPLAYTEST = 15
+
+
+class SimDriver:
+    """Registers of one MAX7219 (power-on values)."""
+    def __init__(self):
+        self.digits = bytearray(8)
+        self.decodemode = 0
+        self.intensity = 0
+        self.scanlimit = 0
+        self.shutdown = True
+        self.displaytest = False
+
+    def latch(self, address, data):
+        address &= 0x0F
+        if _DIGIT0 <= address <= _DIGIT7:
+            self.digits[address - _DIGIT0] = data
+        elif address == _DECODEMODE:
+            self.decodemode = data
+        elif address == _INTENSITY:
+            self.intensity = data & 0x0F
+        elif address == _SCANLIMIT:
+            self.scanlimit = data & 0x07
+        elif address == _SHUTDOWN:
+            self.shutdown = not (data & 1)
+        elif address == _DISPLAYTEST:
+            self.displaytest = bool(data & 1)
+
+    def lit(self, digit, bit):
+        if self.displaytest:
+            return True
+        if self.shutdown or digit > self.scanlimit:
+            return False
+        return bool(self.digits[digit] & (1 << bit))
+
+
+class SimChain:
+    def __init__(self, geometry=CLOCK):
+        self.geometry = geometry
+        self.drivers = [SimDriver() for _ in range(geometry.chips)]
+        self._shift = bytearray(2*geometry.chips)  # shift registers, first byte in the last driver
+        self._selected = False
+        self.transactions = 0
+        self.bytes = 0
+        self.cs_toggles = 0
+
+    def select(self):
+        self.cs_toggles += 1
+        if not self._selected:
+            self._selected = True
+            self.transactions += 1
+
+    def latch(self):
+        self.cs_toggles += 1
+        if self._selected:
+            self._selected = False
+            last = len(self.drivers) - 1
+            for chip, driver in enumerate(self.drivers):
+                pos = 2*(last - chip)
+                driver.latch(self._shift[pos], self._shift[pos + 1])
+
+    def shift_in(self, data):
+        if not self._selected:
+            return  # the drivers ignore the clock while CS is high
+        self.bytes += len(data)
+        n = len(self._shift)
+        if len(data) >= n:
+            self._shift[:] = data[len(data) - n:]
+        else:
+            self._shift[:] = self._shift[len(data):] + data
+
+    def frame_stats(self):
+        """Returns (transactions, bytes, cs_toggles) since the last call."""
+        stats = (self.transactions, self.bytes, self.cs_toggles)
+        self.transactions = self.bytes = self.cs_toggles = 0
+        return stats
+
+    def pixels(self):
+        """Returns the lit pixels as a list of [r, c]."""
+        g = self.geometry
+        result = []
+        for p in range(g.rows*g.cols):
+            index = g.index[p]
+            if index != 0xFF and self.drivers[index // 8].lit(index % 8, g.bit[p]):
+                result.append([p // g.cols, p % g.cols])
+        return result
+
+    def render(self, letters=None):
+        """Returns the face as text, lit pixels showing their letter."""
+        if letters is None:
+            from textmatrix import CharacterMatrix
+            letters = CharacterMatrix.MATRIX
+        g = self.geometry
+        out = [[" "] * g.cols for _ in range(g.rows)]
+        for r, c in self.pixels():
+            out[r][c] = letters[r*g.cols + c] if r*g.cols + c < len(letters) else "#"
+        return "\n".join("".join(row) for row in out)
+
+
+class SimSPI:
+    def __init__(self, chain):
+        self._chain = chain
+
+    def write(self, buf):
+        self._chain.shift_in(buf)
+
+
+class SimPin:
+    """The CS pin of the chain."""
+    def __init__(self, chain):
+        self._chain = chain
+        self._value = 1
+
+    def on(self):
+        self._value = 1
+        self._chain.latch()
+
+    def off(self):
+        self._value = 0
+        self._chain.select()
+
+    def value(self):
+        return self._value
+
+
+def simulated_matrix(geometry=CLOCK, shadow=None):
+    """Returns a Max7219Chain driving a SimChain, and the SimChain."""
+    from leddriver import Max7219Chain
+    chain = SimChain(geometry)
+    matrix = Max7219Chain(1, 0, spi=SimSPI(chain), cs=SimPin(chain), shadow=shadow, geometry=geometry)
+    return matrix, chain
+
+
+def mode_frames():
+    """Returns (name, frame) of every mode with fixed example values."""
+    from common import SUNNY, CLOUDY, RAINY, SNOWY
+    from frame import Frame
+    from textmatrix import TextFinder
+    finder = TextFinder()
+    screens = (("time 10:42", lambda: finder.get_time_frame(10, 42)),
+               ("time 10:43", lambda: finder.get_time_frame(10, 43)),
+               ("time 12:00", lambda: finder.get_time_frame(12, 0)),
+               ("temperature 21.5", lambda: finder.get_temperature_frame(21.5)),
+               ("temperature -3.2", lambda: finder.get_temperature_frame(-3.2)),
+               ("humidity 56", lambda: finder.get_humidity_frame(56)),
+               ("luminance 123", lambda: finder.get_luminance_frame(123)),
+               ("date 18.10", lambda: finder.get_date_frame(18, 10)),
+               ("weather sunny", lambda: finder.get_weather_frame(SUNNY)),
+               ("weather cloudy", lambda: finder.get_weather_frame(CLOUDY)),
+               ("weather rainy", lambda: finder.get_weather_frame(RAINY)),
+               ("weather snowy", lambda: finder.get_weather_frame(SNOWY)),
+               ("custom", lambda: Frame().add_positions([[0, 0], [2, 8], [6, 5], [7, 4], [8, 0]])),
+               ("all on", lambda: Frame().fill()))
+    result = []
+    for name, get_frame in screens:
+        frame = Frame()
+        frame.buffer[:] = get_frame().buffer
+        result.append((name, frame))
+    return result
+
+
+def run_modes():
+    """Shows every mode on a simulated chain, returns (name, rendering, traffic)."""
+    matrix, chain = simulated_matrix()
+    print("init: {} transactions, {} bytes, {} CS toggles".format(*chain.frame_stats()))
+    result = []
+    for name, frame in mode_frames():
+        matrix.show_frame(frame)
+        result.append((name, chain.render(), chain.frame_stats()))
+    return result
+
+
+def main(args):
+    results = run_modes()
+    text = "".join("== {}\n{}\n".format(name, rendering) for name, rendering, _ in results)
+    for name, rendering, stats in results:
+        print("== {}: {} transactions, {} bytes, {} CS toggles".format(name, *stats))
+        print(rendering)
+    if "--update" in args:
+        with open(GOLDEN_FILE, "w", encoding="utf-8") as f:
+            f.write(text)
+        print("Wrote", GOLDEN_FILE)
+        return 0
+    with open(GOLDEN_FILE, encoding="utf-8") as f:
+        golden = f.read()
+    if golden != text:
+        print("Frames differ from", GOLDEN_FILE)
+        return 1
+    print("All frames match", GOLDEN_FILE)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
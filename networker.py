@@ -0,0 +1,107 @@
+"""
+Network jobs on a second thread.
+
+NTP, the weather, the version check and the OTA download block while their
+requests are running. With "worker" in the config, the mode session hands
+them to a NetWorker, so that the main thread keeps showing the screens,
+taking the touches and serving the portal. The results come back through a
+lock-protected mailbox, which the main thread empties with take().
+
+The _thread of MicroPython on the ESP32 runs all threads on one core, and
+only one of them holds the GIL at a time: the threads take turns, the work
+of the jobs does not get faster. What overlaps is the waiting, a blocking
+socket call releases the GIL.
+
+The thread only runs while there are jobs. The same code runs with the
+_thread of CPython:
+
+    python networker.py
+"""
+try:
+    import _thread
+except ImportError:
+    _thread = None  # a port without threads
+
+AVAILABLE = _thread is not None
+STACK_SIZE = 32*1024  # enough for the TLS of the requests, and the minimum of CPython
+
+
+class NetWorker:
+    def __init__(self, stack_size=STACK_SIZE):
+        self._lock = _thread.allocate_lock()
+        self._jobs = []  # (name, function, args), only touched under the lock
+        self._results = []  # (name, ok, result or exception), the mailbox
+        self._running = False
+        self._stack_size = stack_size
+
+    def submit(self, name, function, *args):
+        """Runs function(*args) on the worker thread, its result comes back as name."""
+        with self._lock:
+            self._jobs.append((name, function, args))
+            if self._running:
+                return
+            self._running = True
+        _thread.stack_size(self._stack_size)
+        _thread.start_new_thread(self._run, ())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._jobs:
+                    self._running = False
+                    return
+                name, function, args = self._jobs.pop(0)
+            try:
+                result = (name, True, function(*args))
+            except Exception as e:
+                result = (name, False, e)
+            with self._lock:
+                self._results.append(result)
+
+    def take(self):
+        """Returns the (name, ok, result) of the jobs finished since the last call, ok False if
+        the result is the exception the job raised."""
+        with self._lock:
+            results = self._results
+            self._results = []
+        return results
+
+    @property
+    def busy(self):
+        with self._lock:
+            return self._running or bool(self._jobs)
+
+
+if __name__ == "__main__":
+    import time
+
+    def blocking(seconds, value):
+        time.sleep(seconds)  # like a request
+        return value
+
+    def failing():
+        raise OSError("no network")
+
+    worker = NetWorker()
+    worker.submit("ntp", blocking, 0.3, True)
+    worker.submit("weather", blocking, 0.2, 21.5)
+    worker.submit("version", failing)
+    frames = 0
+    results = {}
+    start = time.time()
+    while worker.busy or len(results) < 3:
+        frames += 1  # the main thread keeps rendering
+        for name, ok, result in worker.take():
+            results[name] = (ok, result)
+        time.sleep(0.01)
+        assert time.time() - start < 5, "worker did not finish"
+    results.update((name, (ok, result)) for name, ok, result in worker.take())
+    assert results["ntp"] == (True, True), results
+    assert results["weather"] == (True, 21.5), results
+    assert not results["version"][0] and isinstance(results["version"][1], OSError), results
+    assert frames > 10, "main thread was blocked"
+    worker.submit("again", blocking, 0, "restarted")
+    while worker.busy:
+        time.sleep(0.01)
+    assert worker.take() == [("again", True, "restarted")]
+    print("NetWorker ok,", frames, "frames while the jobs ran")
@@ -47,10 +47,12 @@ class Response:
 
 class HttpClient:
 
-    def __init__(self, headers={}):
+    def __init__(self, headers={}, timeout=None):
         self._headers = headers
+        self._timeout = timeout  # seconds for connecting and each read or write, None blocks
 
-    def request(self, method, url, data=None, json=None, file=None, custom=None, saveToFile=None, headers={}, stream=None):
+    def request(self, method, url, data=None, json=None, file=None, custom=None, saveToFile=None, headers={}, stream=None, redirects=3, default_headers=True):
+        # default_headers False leaves out the headers of the client, e.g. its token on a redirect to another host
         def _write_headers(sock, _headers):
             for k in _headers:
                 sock.write(b'{}: {}\r\n'.format(k, _headers[k]))
@@ -82,6 +84,8 @@ class HttpClient:
 
         s = usocket.socket(ai[0], ai[1], ai[2])
         try:
+            if self._timeout is not None:
+                s.settimeout(self._timeout)
             s.connect(ai[-1])
             if proto == 'https:':
                 s = ssl.wrap_socket(s, server_hostname=host)
@@ -89,7 +93,8 @@ class HttpClient:
             if not 'Host' in headers:
                 s.write(b'Host: %s\r\n' % host)
             # Iterate over keys to avoid tuple alloc
-            _write_headers(s, self._headers)
+            if default_headers:
+                _write_headers(s, self._headers)
             _write_headers(s, headers)
 
             # add user agent
@@ -122,6 +127,7 @@ class HttpClient:
             reason = ''
             if len(l) > 2:
                 reason = l[2].rstrip()
+            location = None
             while True:
                 l = s.readline()
                 if not l or l == b'\r\n':
@@ -130,12 +136,20 @@ class HttpClient:
                 if l.startswith(b'Transfer-Encoding:'):
                     if b'chunked' in l:
                         raise ValueError('Unsupported ' + l)
-                elif l.startswith(b'Location:') and not 200 <= status <= 299:
-                    raise NotImplementedError('Redirects not yet supported')
+                elif l.lower().startswith(b'location:') and not 200 <= status <= 299:
+                    if method not in ('GET', 'HEAD') or not redirects:
+                        raise NotImplementedError('Redirects not yet supported')
+                    location = l[9:].strip().decode()
         except OSError:
             s.close()
             raise
 
+        if location:
+            # e.g. the download of a release asset
+            s.close()
+            return self.request(method, location, saveToFile=saveToFile, headers=headers, redirects=redirects - 1,
+                                default_headers=False)
+
         resp = Response(s, saveToFile)
         resp.status_code = status
         resp.reason = reason
@@ -1,4 +1,4 @@
-import os, gc
+import os, gc, sys
 import machine
 from ota_httpclient import HttpClient
 
@@ -8,8 +8,8 @@ class OTAUpdater:
     optimized for low power usage.
     """
 
-    def __init__(self, github_repo, github_src_dir='', module='', main_dir='main', new_version_dir='next', secrets_file=None, headers={}):
-        self.http_client = HttpClient(headers=headers)
+    def __init__(self, github_repo, github_src_dir='', module='', main_dir='main', new_version_dir='next', secrets_file=None, headers={}, timeout=None):
+        self.http_client = HttpClient(headers=headers, timeout=timeout)
         self.github_repo = github_repo.rstrip('/').replace('https://github.com/', '')
         self.github_src_dir = '' if len(github_src_dir) < 1 else github_src_dir.rstrip('/') + '/'
         self.module = module.rstrip('/')
@@ -152,16 +152,40 @@ class OTAUpdater:
 
     def _download_new_version(self, version):
         print('Downloading version {}'.format(version))
-        self._download_all_files(version)
+        compiled = self._download_bytecode(version)
+        self._download_all_files(version, skip=compiled)
         print('Version {} downloaded to {}'.format(version, self.modulepath(self.new_version_dir)))
 
-    def _download_all_files(self, version, sub_dir=''):
+    def _download_bytecode(self, version):
+        """Downloads the .mpy assets of the release (see release.py), returns the sources they replace.
+
+        Bytecode that this firmware cannot import, e.g. of another mpy-cross, is deleted again and
+        its source downloaded instead."""
+        release = self.http_client.get('https://api.github.com/repos/{}/releases/tags/{}'.format(self.github_repo, version))
+        assets = [(asset['name'], asset['browser_download_url']) for asset in release.json().get('assets', ()) if asset['name'].endswith('.mpy')]
+        release.close()
+        sources = []
+        for name, url in assets:
+            path = self.modulepath(self.new_version_dir + '/' + name)
+            print('\tDownloading: ', name, 'to', path)
+            self.http_client.get(url, saveToFile=path)
+            if self._bytecode_compatible(path):
+                sources.append(name[:-4] + '.py')
+            else:
+                print('\tIncompatible bytecode, using the source of', name)
+                os.remove(path)
+            gc.collect()
+        return sources
+
+    def _download_all_files(self, version, sub_dir='', skip=()):
         url = 'https://api.github.com/repos/{}/contents{}{}{}?ref=refs/tags/{}'.format(self.github_repo, self.github_src_dir, self.main_dir, sub_dir, version)
         gc.collect()
         file_list = self.http_client.get(url)
         for file in file_list.json():
             path = self.modulepath(self.new_version_dir + '/' + file['path'].replace(self.main_dir + '/', '').replace(self.github_src_dir, ''))
-            if file['type'] == 'file':
+            if file['type'] == 'file' and not sub_dir and file['name'] in skip:
+                print('\tSkipping: ', file['path'], '(bytecode)')
+            elif file['type'] == 'file':
                 gitPath = file['path']
                 print('\tDownloading: ', gitPath, 'to', path)
                 self._download_file(version, gitPath, path)
@@ -187,16 +211,42 @@ class OTAUpdater:
     def _delete_old_version(self):
         print('Deleting old version at {} ...'.format(self.modulepath(self.main_dir)))
         for filename in os.listdir(self.new_version_dir):
-            try:
-                filepath = self.main_dir + "/" + filename
-                f = open(filepath, "r")
-                f.close()
-                os.remove(filepath)
-                print("Deleted " + filepath)
-            except OSError:  # open failed
-               print(filename + " does not exit in " + self.main_dir)
+            for name in (filename, self._other_format(filename)):
+                if name is None:
+                    continue
+                try:
+                    filepath = self.main_dir + "/" + name
+                    f = open(filepath, "r")
+                    f.close()
+                    os.remove(filepath)
+                    print("Deleted " + filepath)
+                except OSError:  # open failed
+                   print(name + " does not exit in " + self.main_dir)
         print('Deleted old version at {} ...'.format(self.modulepath(self.main_dir)))
 
+    @staticmethod
+    def _bytecode_compatible(path):
+        # the header of a .mpy is b'M', its version and flags with the architecture of its native
+        # code (0: none) from bit 2, sys.implementation._mpy has them from bit 0 and bit 10
+        try:
+            mpy = sys.implementation._mpy
+        except AttributeError:
+            return False  # a firmware without .mpy support
+        with open(path, 'rb') as f:
+            header = f.read(4)
+        if len(header) < 4 or header[0] != ord('M') or header[1] != mpy & 0xff:
+            return False
+        return header[2] >> 2 in (0, mpy >> 10)
+
+    @staticmethod
+    def _other_format(filename):
+        # a module is installed either as source or as bytecode, MicroPython would import the .py
+        if filename.endswith('.mpy'):
+            return filename[:-4] + '.py'
+        if filename.endswith('.py'):
+            return filename[:-3] + '.mpy'
+        return None
+
     def _install_new_version(self):
         print('Installing new version at {} ...'.format(self.modulepath(self.main_dir)))
         if self._os_supports_rename():
@@ -0,0 +1,167 @@
+"""
+Release artifacts: the modules of the clock precompiled to .mpy bytecode.
+
+Runs on the host:
+
+    python release.py build [-o release] [--mpy-cross mpy-cross] [--march xtensawin]
+    python release.py cost [-m micropython] [-o release]
+
+build compiles every module that runs on the clock with mpy-cross, which has
+to be of the MicroPython version of the firmware. Attach the .mpy files to
+the GitHub release of the tag: the OTAUpdater installs them instead of the
+.py sources. boot.py and main.py stay sources, MicroPython only runs those.
+
+cost measures what the bytecode saves on each wake: the time and the heap the
+compiler takes for each source, and the time of importing the source and the
+bytecode built into the output directory, with the unix port of MicroPython
+(with CPython if it is not installed, which is less representative and cannot
+import .mpy), and the sizes of the source and the bytecode. Modules that need
+the hardware, e.g. machine, cannot be imported on the host and show "-".
+Modules marked * are imported on every fast wake, those marked + only on
+some: the light sensor when its reading is old, the frame table and the
+animation when the minute is shown, not in the dark hours. The import times on the clock itself are printed by fastwake.report()
+and kept in the imports phase of wakeprofile.
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+SOURCES = ("boot.py", "main.py")  # run as sources by MicroPython
+HOST_ONLY = ("bench.py", "layout.py", "max7219sim.py", "release.py", "streamclient.py", "unittest.py")
+FAST_PATH = ("alignment", "common", "darkhours", "fastwake", "frame", "governor", "leddriver", "localtime",
+             "rtcstate", "scheduler", "wakeprofile")  # imported by every fast wake
+FAST_PATH_SOME = ("animation", "frametable", "lightsensor")  # imported by some
+OUTPUT_DIR = "release"
+RUNS = 5
+
+# prints the best compile time (us) and the heap allocated by the compiler (bytes) of a source
+_COMPILE_COST = """
+import gc, time
+try:
+    ticks_us, ticks_diff = time.ticks_us, time.ticks_diff
+except AttributeError:
+    ticks_us, ticks_diff = lambda: time.perf_counter_ns() // 1000, lambda a, b: a - b
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+with open({path!r}) as f:
+    src = f.read()
+best = None
+for run in range({runs}):
+    gc.collect()
+    if tracemalloc:
+        tracemalloc.start()
+    else:
+        gc.disable()
+        before = gc.mem_alloc()
+    t = ticks_us()
+    compile(src, {path!r}, "exec")
+    us = ticks_diff(ticks_us(), t)
+    if tracemalloc:
+        heap = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    else:
+        heap = gc.mem_alloc() - before
+        gc.enable()
+    best = us if best is None else min(best, us)
+print(best, heap)
+"""
+
+# prints the best time (us) of importing a module from the current directory, its own imports
+# already loaded, or - if it cannot be imported on the host
+_IMPORT_COST = """
+import sys, time
+try:
+    ticks_us, ticks_diff = time.ticks_us, time.ticks_diff
+except AttributeError:
+    ticks_us, ticks_diff = lambda: time.perf_counter_ns() // 1000, lambda a, b: a - b
+try:
+    __import__({name!r})
+except Exception:
+    print("-")
+    raise SystemExit
+best = None
+for run in range({runs}):
+    del sys.modules[{name!r}]
+    t = ticks_us()
+    __import__({name!r})
+    us = ticks_diff(ticks_us(), t)
+    best = us if best is None else min(best, us)
+print(best)
+"""
+
+
+def modules(directory="."):
+    """Returns the file names of the modules to compile."""
+    return sorted(name for name in os.listdir(directory)
+                  if name.endswith(".py") and name not in SOURCES and name not in HOST_ONLY)
+
+
+def build(output_dir=OUTPUT_DIR, mpy_cross="mpy-cross", march="xtensawin"):
+    if shutil.which(mpy_cross) is None:
+        sys.exit("{} not found, install the one of the firmware version (e.g. pip install mpy-cross==<version>)".format(mpy_cross))
+    os.makedirs(output_dir, exist_ok=True)
+    for name in modules():
+        target = os.path.join(output_dir, name[:-3] + ".mpy")
+        # -march for the @micropython.native functions
+        subprocess.run([mpy_cross, "-march=" + march, "-o", target, name], check=True)
+        print("{:<20} {:>7} -> {:>7} bytes".format(name, os.path.getsize(name), os.path.getsize(target)))
+    print("Wrote", len(modules()), "modules to", output_dir + ", attach the .mpy files to the release")
+
+
+def cost(interpreter=None, output_dir=OUTPUT_DIR):
+    if interpreter is None:
+        interpreter = "micropython" if shutil.which("micropython") else sys.executable
+    print("Compile and import costs with", interpreter)
+    micropython = "micropython" in os.path.basename(interpreter)
+    command = [interpreter, "-X", "heapsize=8M"] if micropython else [interpreter, "-B"]
+    row = "{:<22} {:>8} {:>8} {:>10} {:>10} {:>10} {:>10}"
+    print(row.format("module", "py", "mpy", "compile us", "heap", "import py", "import mpy"))
+    totals = [0, 0, 0, 0]
+    fast = [0, 0, 0, 0]
+    some = [0, 0, 0, 0]
+    for name in modules():
+        result = subprocess.run(command + ["-c", _COMPILE_COST.format(path=name, runs=RUNS)],
+                                capture_output=True, text=True, check=True)
+        us, heap = (int(v) for v in result.stdout.split())
+        mpy = os.path.join(output_dir, name[:-3] + ".mpy")
+        mpy_size = os.path.getsize(mpy) if os.path.exists(mpy) else "-"
+        import_py = _import_cost(command, name[:-3], ".")
+        import_mpy = _import_cost(command, name[:-3], output_dir) if micropython and os.path.exists(mpy) else "-"
+        mark = " *" if name[:-3] in FAST_PATH else " +" if name[:-3] in FAST_PATH_SOME else ""
+        print(row.format(name + mark, os.path.getsize(name), mpy_size, us, heap, import_py, import_mpy))
+        for i, value in enumerate((us, heap, import_py, import_mpy)):
+            if isinstance(value, int):
+                totals[i] += value
+                if mark == " *":
+                    fast[i] += value
+                elif mark == " +":
+                    some[i] += value
+    print(row.format("all", "", "", *totals))
+    print(row.format("fast wake *", "", "", *fast))
+    print(row.format("some fast wakes +", "", "", *some))
+
+
+def _import_cost(command, module, directory):
+    # the import from directory finds the .py sources or the .mpy of the release there
+    result = subprocess.run(command + ["-c", _IMPORT_COST.format(name=module, runs=RUNS)],
+                            capture_output=True, text=True, cwd=directory)
+    value = result.stdout.strip()
+    return int(value) if value.isdigit() else "-"
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Builds and measures the .mpy release artifacts")
+    parser.add_argument("command", choices=("build", "cost"))
+    parser.add_argument("-o", "--output", default=OUTPUT_DIR)
+    parser.add_argument("--mpy-cross", default="mpy-cross")
+    parser.add_argument("--march", default="xtensawin")
+    parser.add_argument("-m", "--micropython", default=None, help="interpreter to measure with")
+    args = parser.parse_args()
+    if args.command == "build":
+        build(args.output, args.mpy_cross, args.march)
+    else:
+        cost(args.micropython, args.output)
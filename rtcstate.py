@@ -0,0 +1,126 @@
+"""
+Record of the wake state kept in the RTC memory of the ESP32.
+
+The RTC memory survives deep sleep, but not a power cycle or a hard reset,
+so the record is only loaded after a wake from deep sleep. It is split into
+sections of fixed size, each a memoryview owned by one module.
+"""
+import struct
+import time
+
+_MAGIC = b"TU"
+_VERSION = 8  # increase whenever the sections change
+
+# hour and minute shown (-1: unknown), brightness level, forecast icon (0xFF: no weather),
+# time of the weather and of the brightness (utime.time()),
+# luminance, current and forecast temperature of the weather,
+# estimated latency from the wake until the frame is ready of the full, fast and resident
+# path (ms, 0: unknown), error of the last shown minute to its boundary and its average (ms),
+# hour of the energy budget (utime.time() // 3600), awake ms in it, in the hour before and of
+# the last wake, work deferred in it (bits of governor jobs) and the number of deferrals
+_WAKE_FORMAT = "<bbBBIIfffHHHhHIIIHBH"
+_WAKE_FIELDS = ("hour", "minute", "brightness", "weather_icon",
+                "weather_time", "light_time",
+                "luminance", "current_temp", "forecast_temp",
+                "latency_full", "latency_fast", "latency_resident", "boundary_error", "boundary_error_avg",
+                "budget_hour", "awake_ms", "awake_last_hour_ms", "awake_wake_ms", "deferred", "deferrals")
+
+LIGHT_MAX_AGE_S = 2*60  # the brightness is read again after this
+
+
+def sections():
+    """Returns (name, size) of the sections, the sizes from the modules owning them.
+
+    They are imported here and not with this module, so that an import of
+    rtcstate only costs itself, e.g. in the report of fastwake."""
+    from leddriver import SHADOW_SIZE
+    from scheduler import SECTION_SIZE as JOBS_SIZE
+    from wakeprofile import SECTION_SIZE as PROFILE_SIZE
+    return (("display", SHADOW_SIZE),  # shadow registers of the Max7219Chain
+            ("wake", struct.calcsize(_WAKE_FORMAT)),  # WakeRecord
+            ("profile", PROFILE_SIZE),  # ring buffer of the wake profiles
+            ("jobs", JOBS_SIZE),  # next runs of the periodic jobs
+            )
+
+
+class RTCState:
+    def __init__(self, rtc=None):
+        self._rtc = rtc
+        layout = sections()
+        size = len(_MAGIC) + 1
+        for name, length in layout:
+            size += length
+        self._data = bytearray(size)
+        self._data[:len(_MAGIC)] = _MAGIC
+        self._data[len(_MAGIC)] = _VERSION
+        mv = memoryview(self._data)
+        offset = len(_MAGIC) + 1
+        for name, length in layout:
+            setattr(self, name, mv[offset:offset + length])
+            offset += length
+        self.valid = False
+
+    def _get_rtc(self):
+        if self._rtc is None:
+            from machine import RTC
+            self._rtc = RTC()
+        return self._rtc
+
+    def load(self):
+        """Takes over the stored record if it has the current layout."""
+        stored = self._get_rtc().memory()
+        if len(stored) == len(self._data) and stored[:len(_MAGIC) + 1] == self._data[:len(_MAGIC) + 1]:
+            self._data[:] = stored
+            self.valid = True
+        else:
+            print("No valid state in RTC memory")
+        return self
+
+    def save(self):
+        self._get_rtc().memory(self._data)
+
+
+class WakeRecord:
+    """What the last wake did and measured, kept in the "wake" section.
+
+    read() takes over the values of the section as attributes, write() stores
+    them back. The defaults mean unknown, so a cold start does all work."""
+
+    def __init__(self, section):
+        self._section = section
+        self.clear()
+
+    def clear(self):
+        self.hour = -1
+        self.minute = -1
+        self.brightness = 0
+        self.weather_icon = 0xFF
+        self.weather_time = 0
+        self.light_time = 0
+        self.luminance = -1.0  # darkhours.UNKNOWN_LUX
+        self.current_temp = 0.0
+        self.forecast_temp = 0.0
+        self.latency_full = 0
+        self.latency_fast = 0
+        self.latency_resident = 0
+        self.boundary_error = 0
+        self.boundary_error_avg = 0
+        self.budget_hour = 0
+        self.awake_ms = 0
+        self.awake_last_hour_ms = 0
+        self.awake_wake_ms = 0
+        self.deferred = 0
+        self.deferrals = 0
+        return self
+
+    def light_due(self):
+        """Returns whether the brightness is older than LIGHT_MAX_AGE_S."""
+        return not 0 <= time.time() - self.light_time < LIGHT_MAX_AGE_S
+
+    def read(self):
+        for name, value in zip(_WAKE_FIELDS, struct.unpack_from(_WAKE_FORMAT, self._section)):
+            setattr(self, name, value)
+        return self
+
+    def write(self):
+        struct.pack_into(_WAKE_FORMAT, self._section, 0, *[getattr(self, name) for name in _WAKE_FIELDS])
@@ -0,0 +1,146 @@
+"""
+Periodic jobs, with the time of their next run kept over deep sleeps.
+
+A Job declares its interval, a deadline, a retry backoff and its cost. Its
+state is a slot in the "jobs" section of the RTCState: the next run
+(utime.time(), 0 after a cold start, so that everything runs), since when
+it is deferred and the failures in a row. A wake runs only the due jobs. A
+job that succeeds is due again at the next multiple of its interval. One
+that fails is due again after its backoff, which doubles with every failure
+up to the interval. The governor defers a due job whose cost does not fit
+into the energy budget, but not past its deadline.
+
+The fast path has no jobs, it only asks pending() whether main.py has to
+run some.
+"""
+import struct
+import time
+
+import alignment
+import governor
+
+SLOTS = 8
+# next run, deferred since (0: not deferred), deadline (s after the first deferral, 0: none),
+# cost (ms), failures in a row, governor job of the deferrals
+_FORMAT = "<IIIHBB"
+_SIZE = struct.calcsize(_FORMAT)
+SECTION_SIZE = SLOTS*_SIZE
+_NEVER = 0xFFFFFFFF  # next run of a slot without a job
+
+
+class Job:
+    def __init__(self, slot, name, interval_s, run, kind, cost_ms=None, backoff_s=60, deadline_s=0):
+        # run() returns True if it succeeded, kind is the governor job it is deferred as
+        self.slot = slot
+        self.name = name
+        self.interval_s = interval_s
+        self.run = run
+        self.kind = kind
+        self.cost_ms = governor.COSTS_MS[kind] if cost_ms is None else cost_ms
+        self.backoff_s = backoff_s
+        self.deadline_s = deadline_s
+
+
+def _read(section, slot):
+    return list(struct.unpack_from(_FORMAT, section, slot*_SIZE))
+
+
+def _write(section, slot, entry):
+    struct.pack_into(_FORMAT, section, slot*_SIZE, *entry)
+
+
+def next_run(section):
+    """Returns the earliest next run of all jobs (utime.time())."""
+    return min(struct.unpack_from("<I", section, slot*_SIZE)[0] for slot in range(SLOTS))
+
+
+def _affordable(wake, entry, now):
+    # whether the budget affords a due job, or its deadline is over
+    _, since, deadline_s, cost_ms, _, kind = entry
+    if since and deadline_s and now >= since + deadline_s:
+        return True
+    return governor.allow(wake, kind, cost_ms)
+
+
+def _defer(section, slot, entry, now):
+    if not entry[1]:
+        entry[1] = now
+    entry[0] = now + governor.DEFER_S
+    if entry[2]:
+        entry[0] = min(entry[0], entry[1] + entry[2])
+    _write(section, slot, entry)
+
+
+def pending(section, wake):
+    """Returns whether a job is due, after deferring those that the energy budget does not afford."""
+    now = time.time()
+    result = False
+    for slot in range(SLOTS):
+        entry = _read(section, slot)
+        if alignment.due(now, entry[0]):
+            if _affordable(wake, entry, now):
+                result = True
+            else:
+                _defer(section, slot, entry, now)
+    return result
+
+
+class Scheduler:
+    """Runs the jobs in their slots of section."""
+
+    def __init__(self, section, wake, jobs):
+        self._section = section
+        self._wake = wake
+        self._jobs = jobs
+        slots = [job.slot for job in jobs]
+        for slot in range(SLOTS):
+            entry = _read(section, slot)
+            if slot in slots:
+                job = jobs[slots.index(slot)]
+                entry[2:4] = [job.deadline_s, job.cost_ms]
+                entry[5] = job.kind
+            else:
+                entry = [_NEVER, 0, 0, 0, 0, 0]
+            _write(section, slot, entry)
+
+    def done(self, job):
+        """Schedules job at the next multiple of its interval, e.g. after it ran elsewhere."""
+        now = time.time() + alignment.WINDOW_MS // 1000  # a wake for the upcoming minute counts as at it
+        _write(self._section, job.slot,
+               [now - now % job.interval_s + job.interval_s, 0, job.deadline_s, job.cost_ms, 0, job.kind])
+
+    def failed(self, job):
+        """Schedules job after its backoff."""
+        entry = _read(self._section, job.slot)
+        entry[4] = min(entry[4] + 1, 0xFF)
+        entry[0] = time.time() + min(job.backoff_s << min(entry[4] - 1, 16), job.interval_s)
+        entry[1] = 0
+        _write(self._section, job.slot, entry)
+
+    def trigger(self, job):
+        """Makes job due now, unless it is backing off."""
+        entry = _read(self._section, job.slot)
+        if not entry[4]:
+            entry[0] = min(entry[0], time.time())
+            _write(self._section, job.slot, entry)
+
+    def run(self, job):
+        """Runs job now, returns whether it succeeded."""
+        if job.run():
+            self.done(job)
+            return True
+        print("Job", job.name, "failed")
+        self.failed(job)
+        return False
+
+    def run_due(self):
+        """Runs the due jobs that the energy budget affords, defers the others."""
+        for job in self._jobs:
+            now = time.time()
+            entry = _read(self._section, job.slot)
+            if not alignment.due(now, entry[0]):
+                continue
+            if _affordable(self._wake, entry, now):
+                self.run(job)
+            else:
+                _defer(self._section, job.slot, entry, now)
@@ -8,9 +8,10 @@ class Server:
         # create socket with correct type: stream (TCP) or datagram (UDP)
         self.sock = socket.socket(socket.AF_INET, sock_type)
 
-        # register to get event updates for this socket
+        # register to get event updates for this socket, unless a uasyncio task serves it
         self.poller = poller
-        self.poller.register(self.sock, select.POLLIN)
+        if poller is not None:
+            self.poller.register(self.sock, select.POLLIN)
 
         addr = socket.getaddrinfo("0.0.0.0", port)[0][-1]
         # allow new requests while still sending last response
@@ -20,6 +21,7 @@ class Server:
         print(self.name, "listening on", addr)
 
     def stop(self, poller):
-        poller.unregister(self.sock)
+        if poller is not None:
+            poller.unregister(self.sock)
         self.sock.close()
         print(self.name, "stopped")
@@ -0,0 +1,48 @@
+"""
+Streams frames to the clock over UDP, see captive_stream.StreamServer.
+
+    python streamclient.py <ip> [-f fps] [-b brightness] [-p port]
+
+Runs through all minutes of the frame table, as a test of the stream mode.
+"""
+import argparse
+import socket
+import time
+
+from frame import CLOCK
+from frametable import TABLE_FILE
+
+STREAM_PORT = 4048
+
+
+def send_frames(ip, frames, fps=30, brightness=0, port=STREAM_PORT):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    packet = bytearray(2 + CLOCK.frame_size)
+    packet[1] = brightness
+    period = 1 / fps
+    next_time = time.monotonic()
+    for seq, frame in enumerate(frames):
+        packet[0] = seq & 0xFF
+        packet[2:] = frame
+        sock.sendto(packet, (ip, port))
+        next_time += period
+        time.sleep(max(0, next_time - time.monotonic()))
+    sock.close()
+
+
+def table_frames(filename=TABLE_FILE):
+    with open(filename, "rb") as f:
+        data = f.read()
+    size = CLOCK.frame_size
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("ip")
+    parser.add_argument("-f", "--fps", type=float, default=30)
+    parser.add_argument("-b", "--brightness", type=int, default=0, help="1..15, 0 keeps the brightness")
+    parser.add_argument("-p", "--port", type=int, default=STREAM_PORT)
+    args = parser.parse_args()
+    send_frames(args.ip, table_frames(), args.fps, args.brightness, args.port)
@@ -1,20 +1,10 @@
 from common import SUNNY, CLOUDY, RAINY, SNOWY
+from frame import Frame
 
-"""
-    MATRIX = " MINUSACHTNOLL" + \
-             "EINZWOIVIERDRÜ" + \
-             "ZWÖLFNÜN FÖFÜF" + \
-             "ESEBENSÄCHSEIS" + \
-             "DRISGIVIERTELF" + \
-             "ZWÄNZGZÄHKOMMA" + \
-             "VORAB ESCHALBI" + \
-             "ELFI RACHTIDRÜ" + \
-             " KEISÄCHSINÜNI" + \
-             "SEBNIG NZÄHNI " + \
-             "FÜFISEBEZWÖLFI" + \
-             "ZWOI VIERIGRAD"
-"""
-
+try:
+    import wordindex  # generated by layout.py
+except ImportError:
+    wordindex = None
 
 class CharacterMatrix:
     MATRIX = "BMINUSACHTNOLL" + \
@@ -30,9 +20,58 @@ class CharacterMatrix:
              "FÜFISEBEZWÖLFI" + \
              "ZWOIEVIERIGRAD"
     ROW_LEN = 14
-    
+    SPANS = None  # word -> ((row, col, len), ...), see layout.py
+
+    if wordindex is not None:
+        MATRIX = wordindex.MATRIX
+        ROW_LEN = wordindex.ROW_LEN
+        SPANS = wordindex.SPANS
+
+    @classmethod
+    def findSpans(cls, texts_array):
+        """Returns (row, col, len) of each text in reading order, [] if they don't fit."""
+        result_spans = []
+        pos_in_matrix = 0
+        for text in texts_array:
+            for span in cls.SPANS.get(text, ()):
+                start = span[0] * cls.ROW_LEN + span[1]
+                if start >= pos_in_matrix:
+                    result_spans.append(span)
+                    pos_in_matrix = start + span[2]
+                    break
+            else:
+                print("Text", text, "not found in matrix")
+                return []
+        return result_spans
+
+    @classmethod
+    def drawTexts(cls, texts_array, frame):
+        """Sets the pixels of the texts in frame, returns False (and an empty frame) if they don't fit."""
+        if cls.SPANS is None:
+            frame.add_positions(cls.searchTexts(texts_array))
+            return True
+        pos_in_matrix = 0
+        for text in texts_array:
+            for r, c, length in cls.SPANS.get(text, ()):
+                start = r * cls.ROW_LEN + c
+                if start >= pos_in_matrix:
+                    frame.set_span(r, c, length)
+                    pos_in_matrix = start + length
+                    break
+            else:
+                print("Text", text, "not found in matrix")
+                frame.clear()
+                return False
+        return True
+
     @classmethod
     def findTexts(cls, texts_array):
+        if cls.SPANS is None:
+            return cls.searchTexts(texts_array)
+        return [(r, c + i) for r, c, length in cls.findSpans(texts_array) for i in range(length)]
+
+    @classmethod
+    def searchTexts(cls, texts_array):
         result_coordinates = []
         pos_in_matrix = 0
         for text in texts_array:
@@ -51,27 +90,28 @@ class CharacterMatrix:
     
 
 class TextFinder:
-    PIXEL_NUMBERS=[[[0,1], [0,2], [1,0], [1,3], [2,0], [2,3], [3,0], [3,3], [4,0], [4,3], [5,1], [5,2]],
-                   [[3,0], [2,1], [1,2], [0,3], [1,3], [2,3], [3,3], [4,3], [5,3]],
-                   [[1,0], [0,1], [0,2], [1,3], [2,3], [3,2], [4,1], [5,0], [5,1], [5,2], [5,3]],
-                   [[0,0], [0,1], [0,2], [1,3], [2,1], [2,2], [3,3], [4,3], [5,0], [5,1], [5,2]],
-                   [[2,0], [1,1], [0,2], [1,2], [2,2], [3,0], [3,1], [3,2], [3,3], [4,2], [5,2]],
-                   [[0,0], [0,1], [0,2], [0,3], [1,0], [2,0], [2,1], [2,2], [3,3], [4,3], [5,0], [5,1], [5,2]],
-                   [[0,1], [0,2], [0,3], [1,0], [2,0], [3,0], [4,0], [2,1], [2,2], [3,3], [4,3], [5,1], [5,2]],
-                   [[0,0], [0,1], [0,2], [0,3], [1,3], [2,2], [3,2], [4,2], [5,2]],
-                   [[0,1], [0,2], [1,0], [1,3], [2,1], [2,2], [3,0], [3,3], [4,0], [4,3], [5,1], [5,2]],
-                   [[0,1], [0,2], [1,0], [1,3], [2,0], [2,3], [3,1], [3,2], [3,3], [4,3], [5,0], [5,1], [5,2]]]
-    
+    # Glyphs are tuples of row bitmasks, bit n being column n (so they read mirrored)
+    DIGITS = ((0b0110, 0b1001, 0b1001, 0b1001, 0b1001, 0b0110),
+              (0b1000, 0b1100, 0b1010, 0b1001, 0b1000, 0b1000),
+              (0b0110, 0b1001, 0b1000, 0b0100, 0b0010, 0b1111),
+              (0b0111, 0b1000, 0b0110, 0b1000, 0b1000, 0b0111),
+              (0b0100, 0b0110, 0b0101, 0b1111, 0b0100, 0b0100),
+              (0b1111, 0b0001, 0b0111, 0b1000, 0b1000, 0b0111),
+              (0b1110, 0b0001, 0b0111, 0b1001, 0b1001, 0b0110),
+              (0b1111, 0b1000, 0b0100, 0b0100, 0b0100, 0b0100),
+              (0b0110, 0b1001, 0b0110, 0b1001, 0b1001, 0b0110),
+              (0b0110, 0b1001, 0b1001, 0b1110, 0b1000, 0b0111))
+    MINUS_SIGN = (0b0000, 0b0000, 0b1111, 0b0000, 0b0000, 0b0000)
+    DIGIT_PITCH = 5  # 4 columns glyph + 1 column space
+
     WEATHER = {SUNNY: [[0,5], [1,5], [2,5], [3,5], [4,5], [5,5]], 
                CLOUDY: [[5,1], [6,1], [7,1], [8,1], [9,1]], 
                RAINY: [[7,5], [8,5], [9,5], [10,5]], 
                SNOWY: [[6,7], [7,7], [8,7], [9,7], [10,7], [11,7]]}
 
-    PERCENT = [[4,10], [4,13], [5,12], [6,11], [7,10], [7,13]]
+    PERCENT = (0b1001, 0b0100, 0b0010, 0b1001)  # at row 4, column 10
 
-    LUM = [[9, 3], [10, 3], [11, 3], 
-           [10, 5], [11, 5], [11, 6], [10, 7], [11, 7], 
-           [10, 9], [11, 9], [10, 10], [10, 11], [11, 11], [10, 12], [10, 13], [11, 13]]
+    LUM = (0b00000000001, 0b11111010101, 0b10101011101)  # "lux" at row 9, column 3
     
     MINUTES_TEXTS = [["ES", "ESCH"], ["EIS", "AB"], ["ZWOI", "AB"], ["DRÜ", "AB"], ["VIER", "AB"], ["FÜF", "AB"], ["SÄCHS", "AB"], ["SEBE", "AB"], ["ACHT", "AB"], ["NÜN", "AB"], 
                      ["ZÄH", "AB"], ["ELF", "AB"], ["ZWÖLF", "AB"], ["DRI", "ZÄH", "AB"], ["VIER", "ZÄH", "AB"], ["VIERTEL", "AB"], ["SÄCH", "ZÄH", "AB"], ["SEB", "ZÄH", "AB"], ["ACHT", "ZÄH", "AB"], ["NÜN", "ZÄH", "AB"], 
@@ -95,6 +135,7 @@ class TextFinder:
     
     def __init__(self):
         self._matrix = CharacterMatrix
+        self._frame = Frame()  # reused by all get_*_frame methods
 
     #@classmethod
     def _get_minutes_text(self, minutes):
@@ -108,56 +149,87 @@ class TextFinder:
     def _get_hours_text(self, hours):
         return [self.HOURS_TEXTS[hours % 12]]  # zero == twelve, 13..24 == 1..12
 
-    def get_time_positions(self, hours, minutes):
-        print("Searching", hours, ":", minutes)
+    def _draw_number(self, number, r, c, digits, leading_zeros=False):
+        """Draws number right aligned into digits cells starting at column c.
+
+        A minus sign takes the cell left of the first digit."""
+        value = abs(number)
+        pos = c + (digits - 1) * self.DIGIT_PITCH
+        while True:
+            self._frame.blit(self.DIGITS[value % 10], r, pos)
+            value //= 10
+            pos -= self.DIGIT_PITCH
+            if pos < c or (value == 0 and not leading_zeros):
+                break
+        if number < 0:
+            self._frame.blit(self.MINUS_SIGN, r, pos)
+
+    def get_time_texts(self, hours, minutes):
         if minutes >= 25:  # We say "Halbi <Next Hour>" and "zäh vor <Next Hour>"
             hours = hours + 1
-        return self._matrix.findTexts(self._get_minutes_text(minutes) + self._get_hours_text(hours))
+        return self._get_minutes_text(minutes) + self._get_hours_text(hours)
 
-    def get_temperature_positions(self, temperature):
+    def get_time_frame(self, hours, minutes):
+        print("Searching", hours, ":", minutes)
+        self._matrix.drawTexts(self.get_time_texts(hours, minutes), self._frame.clear())
+        return self._frame
+
+    def get_temperature_frame(self, temperature):
         print("Searching Temp.", temperature)
         sign = [self.MINUS] if temperature < 0 else []
         before = int(abs(temperature))
         after = int(round(abs(temperature) * 10, 0)) % 10
         after_texts = [self.DOT] + self.TEMP_AFTER_DIGIT[after] if after != 0 else []
-        return self._matrix.findTexts(sign + self.TEMP_BEFORE_DIGIT[before] + after_texts + [self.DEGREE])
+        self._matrix.drawTexts(sign + self.TEMP_BEFORE_DIGIT[before] + after_texts + [self.DEGREE], self._frame.clear())
+        return self._frame
 
-    def get_humidity_positions(self, humidity):
+    def get_humidity_frame(self, humidity):
         print("Searching Hum.", humidity)
-        humidity_int = int(round(humidity,0))
-        ten_positions = self.PIXEL_NUMBERS[humidity_int // 10]
-        one_positions = self.PIXEL_NUMBERS[humidity_int % 10]
-        return [[p[0]+3, p[1]] for p in ten_positions] + [[p[0]+3, p[1]+5] for p in one_positions] + self.PERCENT
+        humidity_int = min(int(round(humidity,0)), 99)
+        self._frame.clear()
+        self._draw_number(humidity_int, 3, 0, 2, leading_zeros=True)
+        self._frame.blit(self.PERCENT, 4, 10)
+        return self._frame
 
-    def get_date_positions(self, day, month):
+    def get_date_frame(self, day, month):
         print("Searching date", day, month)
-        positions = [[p[0], p[1]+8] for p in self.PIXEL_NUMBERS[day % 10]]
-        if day >= 10:
-            positions += [[p[0], p[1]+3] for p in self.PIXEL_NUMBERS[day // 10]]
-        positions += [[p[0]+6, p[1]+8] for p in self.PIXEL_NUMBERS[month % 10]]
-        if month >= 10:
-            positions += [[p[0]+6, p[1]+3] for p in self.PIXEL_NUMBERS[month // 10]]
-        return positions + [[5, 13], [11, 13]]
+        self._frame.clear()
+        self._draw_number(day, 0, 3, 2)
+        self._draw_number(month, 6, 3, 2)
+        self._frame.set_pixel(5, 13)
+        self._frame.set_pixel(11, 13)
+        return self._frame
 
-    def get_luminance_position(self, luminance):
+    def get_luminance_frame(self, luminance):
         print("Searching Lum.", luminance)
         luminance_int = min(int(round(luminance,0)), 999)
-        if luminance_int >= 100:
-            hun_positions = self.PIXEL_NUMBERS[luminance_int // 100]
-        else:
-            hun_positions = []
-        if luminance_int >= 10:
-            ten_positions = self.PIXEL_NUMBERS[(luminance_int // 10) % 10]
-        else:
-            ten_positions = []
-        one_positions = self.PIXEL_NUMBERS[luminance_int % 10]
-        return [[p[0]+2, p[1]] for p in hun_positions] + \
-               [[p[0]+2, p[1]+5] for p in ten_positions] + \
-               [[p[0]+2, p[1]+10] for p in one_positions] + \
-               self.LUM
+        self._frame.clear()
+        self._draw_number(luminance_int, 2, 0, 3)
+        self._frame.blit(self.LUM, 9, 3)
+        return self._frame
+
+    def get_weather_frame(self, weather_code):
+        return self._frame.clear().add_positions(self.WEATHER[weather_code])
+
+    # List based interface, returning the [r, c] of all pixels to show
+
+    def get_time_positions(self, hours, minutes):
+        return self.get_time_frame(hours, minutes).positions()
+
+    def get_temperature_positions(self, temperature):
+        return self.get_temperature_frame(temperature).positions()
+
+    def get_humidity_positions(self, humidity):
+        return self.get_humidity_frame(humidity).positions()
+
+    def get_date_positions(self, day, month):
+        return self.get_date_frame(day, month).positions()
+
+    def get_luminance_position(self, luminance):
+        return self.get_luminance_frame(luminance).positions()
 
     def get_weather_positions(self, weather_code):
-        return self.WEATHER[weather_code]
+        return self.get_weather_frame(weather_code).positions()
  
 
 if __name__ == "__main__":
@@ -1,10 +1,35 @@
-from machine import Pin
+from machine import Pin, disable_irq, enable_irq
 import esp32
+import micropython
+import utime
+
+DEBOUNCE_MS = 80  # edges closer to the previous tap are contact bounce
+QUEUE_SIZE = 8
+
 
 class TouchSensor:
-    def __init__(self, pin_nr, callback):
+    """Touch input, with the taps recorded by the IRQ and handled later.
+
+    The IRQ only stores the ticks_ms of a tap in a preallocated queue and
+    schedules the dispatch with micropython.schedule. The dispatch coalesces
+    all queued taps into one callback(taps), so that rapid taps skip screens
+    instead of drawing each of them, and measures the latency from the first
+    tap until the callback returned."""
+
+    def __init__(self, pin_nr, callback, debounce_ms=DEBOUNCE_MS):
         self.pin = Pin(pin_nr, Pin.IN)
-        self.pin.irq(trigger=Pin.IRQ_RISING, handler=lambda x: callback())
+        self._callback = callback
+        self._debounce_ms = debounce_ms
+        self._queue = [0] * QUEUE_SIZE  # ticks_ms of the taps
+        self._head = 0
+        self._count = 0
+        self._last_tap = utime.ticks_add(utime.ticks_ms(), -debounce_ms)
+        self._scheduled = False
+        self._dispatch_ref = self._dispatch  # bound once, creating it in the IRQ would allocate
+        self.dropped = 0
+        self.last_latency_ms = -1
+        self.max_latency_ms = -1
+        self.pin.irq(trigger=Pin.IRQ_RISING, handler=self._irq, hard=True)
 
     def is_pressed(self):
         return self.pin.value()
@@ -12,9 +37,42 @@ class TouchSensor:
     def configure_for_wakeup(self):
         esp32.wake_on_ext0(pin = self.pin, level = esp32.WAKEUP_ANY_HIGH)
 
+    def _irq(self, pin):
+        # hard IRQ: no allocation, no I2C/SPI
+        now = utime.ticks_ms()
+        if utime.ticks_diff(now, self._last_tap) < self._debounce_ms:
+            return
+        self._last_tap = now
+        if self._count == QUEUE_SIZE:
+            self.dropped += 1
+            return
+        self._queue[(self._head + self._count) % QUEUE_SIZE] = now
+        self._count += 1
+        if not self._scheduled:
+            try:
+                micropython.schedule(self._dispatch_ref, None)
+                self._scheduled = True
+            except RuntimeError:
+                pass  # schedule queue full, the next tap tries again
+
+    def _dispatch(self, _):
+        self._scheduled = False
+        state = disable_irq()
+        first = self._queue[self._head]
+        taps = self._count
+        self._head = (self._head + taps) % QUEUE_SIZE
+        self._count = 0
+        enable_irq(state)
+        if taps == 0:
+            return
+        self._callback(taps)
+        self.last_latency_ms = utime.ticks_diff(utime.ticks_ms(), first)
+        self.max_latency_ms = max(self.max_latency_ms, self.last_latency_ms)
+        print("Touch:", taps, "taps, shown after", self.last_latency_ms, "ms")
+
 
 def demotouch():
     import time
-    def _pressed():
-        print("PRESSED!")
+    def _pressed(taps):
+        print("PRESSED!", taps)
     return TouchSensor(0, _pressed)
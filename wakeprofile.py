@@ -0,0 +1,83 @@
+"""
+Time spent in the phases of a wake, kept over deep sleeps.
+
+Every wake adds the ticks_us since the previous end() to the phase it ends.
+The first phase starts at the reset, so BOOT includes the start of the
+firmware. Before deep sleeping, store() appends the phases of the wake to a
+ring buffer of the last WAKES wakes in the "profile" section of the
+RTCState, and stats() aggregates it, e.g. for the /metrics route.
+"""
+try:
+    from micropython import const
+except ImportError:
+    const = lambda v: v
+import struct
+import time
+
+BOOT = const(0)  # start of the firmware and the update check of boot.py
+IMPORTS = const(1)  # imports and the config
+INIT = const(2)  # RTC state and the construction of the hardware
+LIGHT = const(3)  # reading the light sensor
+EXT_RTC = const(4)  # sync from the external RTC
+FRAME = const(5)  # finding the frame of the time
+FLUSH = const(6)  # showing it, SPI flush and animation
+NETWORK = const(7)  # portal session and NTP
+REST = const(8)  # from the last phase until the sleep
+PHASES = const(9)
+NAMES = ("boot", "imports", "init", "light", "ext_rtc", "frame", "flush", "network", "rest")
+
+FULL = const(0)
+FAST = const(1)
+RESIDENT = const(2)  # a wake from light sleep
+PATHS = ("full", "fast", "resident")
+
+WAKES = const(16)
+# next slot, number of stored wakes, path of each wake, phases of each wake (uint32 us)
+SECTION_SIZE = 2 + WAKES*(1 + 4*PHASES)
+_TIMES = 2 + WAKES
+
+_phases = [0] * PHASES
+_last = 0  # ticks_us start at the reset
+
+
+def begin():
+    """Starts a new wake without a reset, e.g. after a light sleep."""
+    global _last
+    for phase in range(PHASES):
+        _phases[phase] = 0
+    _last = time.ticks_us()
+
+
+def end(phase):
+    """Ends phase, adding the time since the previous end to it."""
+    global _last
+    now = time.ticks_us()
+    _phases[phase] += time.ticks_diff(now, _last)
+    _last = now
+
+
+def store(section, path=FULL):
+    """Appends the phases of this wake to the ring buffer in section."""
+    slot = section[0] % WAKES
+    section[2 + slot] = path
+    for phase in range(PHASES):
+        struct.pack_into("<I", section, _TIMES + 4*(slot*PHASES + phase), min(_phases[phase], 0xFFFFFFFF))
+    section[0] = (slot + 1) % WAKES
+    section[1] = min(section[1] + 1, WAKES)
+
+
+def stats(section):
+    """Returns {path: {"wakes": n, phase name: {"min", "avg", "p95"} in us}}."""
+    result = {}
+    for path in range(len(PATHS)):
+        slots = [slot for slot in range(section[1]) if section[2 + slot] == path]
+        if not slots:
+            continue
+        entry = {"wakes": len(slots)}
+        for phase in range(PHASES):
+            values = sorted(struct.unpack_from("<I", section, _TIMES + 4*(slot*PHASES + phase))[0] for slot in slots)
+            entry[NAMES[phase]] = {"min": values[0],
+                                   "avg": sum(values) // len(values),
+                                   "p95": values[(95*len(values) + 99) // 100 - 1]}
+        result[PATHS[path]] = entry
+    return result
@@ -1,5 +1,5 @@
 from micropython import const
-import urequests
+from ota_httpclient import HttpClient
 import common
 import gc
 
@@ -38,11 +38,19 @@ class Weather:
         self.forecast_temp = 0.0
         self.forecast_icon = common.SUNNY
 
-    def update(self):
+    def set_data(self, current_temp, forecast_temp, forecast_icon):
+        # e.g. the weather of an earlier wake, kept in RTC memory
+        self.current_temp = current_temp
+        self.forecast_temp = forecast_temp
+        self.forecast_icon = forecast_icon
+        self.got_data = True
+
+    def update(self, timeout=None):
+        # timeout in seconds for connecting and each read, None blocks until the request is done
         try:
             gc.collect()
             print(self._url)
-            resp = urequests.get(self._url)
+            resp = HttpClient(timeout=timeout).get(self._url)
             print("Got weather data")
             gc.collect()
             data = resp.json()
@@ -0,0 +1,46 @@
+# Generated by layout.py from layout "standard", do not edit.
+LAYOUT = "standard"
+ROW_LEN = 14
+MATRIX = "BMINUSACHTNOLLEINZWOIVIERDRÜZWÖLFNÜNRFÖFÜFESEBENSÄCHSEISDRISGIVIERTELFZWÄNZGZÄHKOMMAVORABUESCHALBIELFINRACHTIDRÜOKEISÄCHSINÜNISEBNIGMNZÄHNIUFÜFISEBEZWÖLFIZWOIEVIERIGRAD"
+SPANS = {
+    "AB": ((6, 3, 2),),
+    "ACHT": ((0, 6, 4), (7, 6, 4)),
+    "ACHTI": ((7, 6, 5),),
+    "DRI": ((4, 0, 3),),
+    "DRISG": ((4, 0, 5),),
+    "DRÜ": ((1, 11, 3), (7, 11, 3)),
+    "E": ((1, 0, 1), (1, 9, 1), (3, 0, 1), (3, 2, 1), (3, 4, 1), (3, 11, 1), (4, 8, 1), (4, 11, 1), (6, 6, 1), (7, 0, 1), (8, 2, 1), (9, 1, 1), (10, 5, 1), (10, 7, 1), (11, 4, 1), (11, 7, 1)),
+    "EIN": ((1, 0, 3),),
+    "EIS": ((3, 11, 3), (8, 2, 3)),
+    "ELF": ((4, 11, 3), (7, 0, 3)),
+    "ELFI": ((7, 0, 4),),
+    "ES": ((3, 0, 2), (6, 6, 2)),
+    "ESCH": ((6, 6, 4),),
+    "FÖF": ((2, 9, 3),),
+    "FÜF": ((2, 11, 3), (10, 0, 3)),
+    "FÜFI": ((10, 0, 4),),
+    "GRAD": ((11, 10, 4),),
+    "HALBI": ((6, 9, 5),),
+    "KOMMA": ((5, 9, 5),),
+    "MINUS": ((0, 1, 5),),
+    "NOLL": ((0, 10, 4),),
+    "NÜN": ((2, 5, 3), (8, 10, 3)),
+    "NÜNI": ((8, 10, 4),),
+    "SEB": ((3, 1, 3), (9, 0, 3), (10, 4, 3)),
+    "SEBE": ((3, 1, 4), (10, 4, 4)),
+    "SEBEN": ((3, 1, 5),),
+    "SEBNI": ((9, 0, 5),),
+    "SÄCH": ((3, 6, 4), (8, 4, 4)),
+    "SÄCHS": ((3, 6, 5), (8, 4, 5)),
+    "SÄCHSI": ((8, 4, 6),),
+    "VIER": ((1, 7, 4), (4, 6, 4), (11, 5, 4)),
+    "VIERI": ((11, 5, 5),),
+    "VIERTEL": ((4, 6, 7),),
+    "VOR": ((6, 0, 3),),
+    "ZWOI": ((1, 3, 4), (11, 0, 4)),
+    "ZWÄNZG": ((5, 0, 6),),
+    "ZWÖLF": ((2, 0, 5), (10, 8, 5)),
+    "ZWÖLFI": ((10, 8, 6),),
+    "ZÄH": ((5, 6, 3), (9, 8, 3)),
+    "ZÄHNI": ((9, 8, 5),),
+}